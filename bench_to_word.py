@@ -0,0 +1,71 @@
+"""
+Benchmark /to-word: membandingkan mode 'layout' (pdf2docx) dengan 'fast' dan 'auto'.
+
+Tanpa argumen, membuat PDF surat/laporan berisi teks saja sebanyak --pages halaman.
+Bisa juga diberi PDF sendiri:
+    python bench_to_word.py
+    python bench_to_word.py --pages 100
+    python bench_to_word.py laporan.pdf surat.pdf
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+import pdf_operations as ops
+
+PARAGRAPH = (
+    "Dengan hormat, bersama surat ini kami sampaikan laporan kegiatan bulanan "
+    "beserta rincian anggaran yang telah digunakan selama periode berjalan. "
+    "Seluruh kegiatan telah dilaksanakan sesuai rencana kerja yang disepakati, "
+    "dengan beberapa penyesuaian jadwal karena kondisi di lapangan."
+)
+
+
+def make_text_pdf(path: str, pages: int):
+    doc = fitz.open()
+    for page_number in range(1, pages + 1):
+        page = doc.new_page()
+        page.insert_text((72, 60), f"Laporan Kegiatan - Halaman {page_number}", fontsize=14, fontname="hebo")
+        rect = fitz.Rect(72, 80, page.rect.width - 72, page.rect.height - 60)
+        page.insert_textbox(rect, "\n\n".join([PARAGRAPH] * 8), fontsize=10)
+    doc.save(path)
+    doc.close()
+
+
+def bench(path: str, repeat: int):
+    print(f"\n{os.path.basename(path)} ({fitz.open(path).page_count} halaman)")
+    baseline = None
+    for mode in ops.WORD_MODES:
+        best = None
+        with tempfile.TemporaryDirectory() as tmp:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                used = ops.pdf_to_word(path, os.path.join(tmp, "out.docx"), mode)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+        baseline = baseline or best
+        print(f"  {mode:7} -> {used:7} {best:8.3f}s  x{baseline / best:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mode konversi PDF ke Word.")
+    parser.add_argument("pdfs", nargs="*", help="PDF yang diuji (default: PDF teks yang dibuat otomatis).")
+    parser.add_argument("--pages", type=int, default=30, help="Jumlah halaman PDF teks yang dibuat.")
+    parser.add_argument("--repeat", type=int, default=3, help="Pengulangan per mode (diambil yang tercepat).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdfs = args.pdfs
+        if not pdfs:
+            path = os.path.join(tmp, f"teks_{args.pages}_halaman.pdf")
+            make_text_pdf(path, args.pages)
+            pdfs = [path]
+        for path in pdfs:
+            bench(path, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,27 @@
 import os
 import tempfile
 import zipfile
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
 from io import BytesIO
-from typing import List
+from typing import List, Optional, Tuple
 import json
+import shutil
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 import uvicorn
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request, Query
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.background import BackgroundTask
 
 # --- Import library PDF ---
-from pypdf import PdfWriter, PdfReader, PasswordType
-from pdf2docx import Converter
-from pdf2image import convert_from_bytes
+from pypdf import PdfWriter, PdfReader
 
 # ... import lainnya ...
 from PIL import Image
@@ -23,19 +30,14 @@ from PIL import Image
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
 from reportlab.lib.utils import ImageReader # <-- [BARU] Tambahkan import ini
 
-# --- Import untuk PowerPoint ---
-from pptx import Presentation
-from pptx.util import Inches
-
-# --- Import untuk Excel ---
-import camelot
-import pandas as pd
 import fitz  # [BARU] Ini adalah PyMuPDF
-from openpyxl.utils.cell import get_column_letter # [BARU]
-from openpyxl.drawing.image import Image as OpenPyXLImage # [BARU]
+
+# --- Operasi PDF inti (dipakai juga oleh /batch dan pdf_cli.py) ---
+import pdf_operations as ops
+from pdf_operations import PdfOperationError, OPTIMIZE_LEVELS
+import memory_guard
 
 app = FastAPI(
     title="BigPDF Backend API",
@@ -43,6 +45,11 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Pencatatan & batas memori per request (opsional, lihat memory_guard.py).
+# Dipasang sebelum CORS supaya response 413/507 tetap membawa header CORS.
+if memory_guard.enabled():
+    app.add_middleware(memory_guard.MemoryGuardMiddleware)
+
 # --- [TAMBAHKAN KODE INI] ---
 # Ini adalah bagian yang penting untuk mengizinkan frontend Anda
 app.add_middleware(
@@ -51,7 +58,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"], # Mengizinkan semua metode (POST, GET, dll)
     allow_headers=["*"], # Mengizinkan semua header
-    expose_headers=["Content-Disposition"],
+    expose_headers=["Content-Disposition", "ETag", "Content-Length", "Content-Location", "Accept-Ranges", "Content-Range", "X-Original-Size", "X-Word-Mode", "X-Memory-Peak-RSS", "X-Memory-Peak-Traced"],
 )
 # --- [SELESAI TAMBAHAN] ---
 
@@ -64,53 +71,674 @@ def cleanup_file(path: str):
         print(f"Error cleaning up file {path}: {e}")
 
 def cleanup_dir(path: str):
-    import shutil
     try:
         shutil.rmtree(path)
     except Exception as e:
         print(f"Error cleaning up directory {path}: {e}")
 
-def create_watermark_pdf(text: str) -> BytesIO:
-    packet = BytesIO()
-    can = canvas.Canvas(packet, pagesize=A4)
-    width, height = A4
-    can.setFont("Helvetica", 50)
-    can.setFillAlpha(0.3)
-    can.translate(width / 2, height / 2)
-    can.rotate(45)
-    can.drawCentredString(0, 0, text)
-    can.save()
-    packet.seek(0)
-    return packet
-
-def parse_page_range(range_str: str, max_pages: int) -> set:
-    """Helper untuk mem-parsing string rentang halaman (cth: '1, 3, 5-7')"""
-    pages = set()
+
+# --- Document Store ---
+# PDF di-upload sekali lewat /documents dan disimpan di disk dengan nama hash isinya.
+# Endpoint lain bisa menerima 'doc_id' sebagai ganti 'file', sehingga frontend tidak
+# perlu mengirim ulang file yang sama untuk setiap operasi.
+DOC_STORE_DIR = os.getenv("DOC_STORE_DIR", os.path.join(tempfile.gettempdir(), "bigpdf_documents"))
+DOC_STORE_TTL = int(os.getenv("DOC_STORE_TTL", "3600")) # detik sejak akses terakhir
+DOC_CACHE_MAX_ITEMS = int(os.getenv("DOC_CACHE_MAX_ITEMS", "32"))
+DOC_CACHE_MAX_BYTES = int(os.getenv("DOC_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Perkiraan kasar memori objek hasil parsing dibanding ukuran file PDF-nya
+DOC_PARSE_OVERHEAD = 3
+
+THUMBNAIL_MAX_PER_DOC = int(os.getenv("THUMBNAIL_MAX_PER_DOC", "500"))
+THUMBNAIL_MIN_WIDTH = 32
+THUMBNAIL_MAX_WIDTH = 600
+THUMBNAIL_MAX_LIMIT = 100
+
+os.makedirs(DOC_STORE_DIR, exist_ok=True)
+
+# doc_id -> {"reader": PdfReader, "fitz": fitz.Document, "thumbs": OrderedDict, "size": int, "thumb_bytes": int}
+_doc_cache: "OrderedDict[str, dict]" = OrderedDict()
+
+def _doc_paths(doc_id: str):
+    if not doc_id.isalnum():
+        raise HTTPException(400, "doc_id tidak valid.")
+    base = os.path.join(DOC_STORE_DIR, doc_id)
+    return base + ".pdf", base + ".json"
+
+def _doc_cache_cost(entry: dict) -> int:
+    parsed = sum(1 for key in ("reader", "fitz") if entry.get(key) is not None)
+    return entry["size"] * DOC_PARSE_OVERHEAD * parsed + entry["thumb_bytes"]
+
+def _close_doc_entry(entry: dict):
+    if entry.get("fitz") is not None:
+        entry["fitz"].close()
+
+def _evict_doc_cache(keep: str):
+    """
+    Buang handle yang paling lama tidak dipakai sampai batas jumlah dan memori terpenuhi.
+    Entri 'keep' (yang sedang dikembalikan ke pemanggil) tidak pernah dibuang, walaupun
+    sendirian sudah melewati batas; entri itu baru dibuang saat dokumen lain dipakai.
+    """
+    total = sum(_doc_cache_cost(e) for e in _doc_cache.values())
+    for doc_id in list(_doc_cache):
+        if len(_doc_cache) <= DOC_CACHE_MAX_ITEMS and total <= DOC_CACHE_MAX_BYTES:
+            break
+        if doc_id == keep:
+            continue
+        entry = _doc_cache.pop(doc_id)
+        total -= _doc_cache_cost(entry)
+        _close_doc_entry(entry)
+
+def purge_expired_documents():
+    """Hapus dokumen tersimpan yang sudah melewati TTL."""
+    now = time.time()
+    for name in os.listdir(DOC_STORE_DIR):
+        if not name.endswith(".pdf"):
+            continue
+        pdf_path = os.path.join(DOC_STORE_DIR, name)
+        try:
+            if now - os.path.getmtime(pdf_path) > DOC_STORE_TTL:
+                delete_document(name[:-4])
+        except OSError:
+            pass
+
+def store_document(pdf_bytes: bytes, filename: str) -> str:
+    """Simpan PDF ke document store dan kembalikan doc_id (hash isi file)."""
+    purge_expired_documents()
+    doc_id = hashlib.sha256(pdf_bytes).hexdigest()[:32]
+    pdf_path, meta_path = _doc_paths(doc_id)
+    if os.path.exists(pdf_path):
+        os.utime(pdf_path)
+    else:
+        tmp_path = pdf_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, pdf_path)
+    _write_doc_meta(meta_path, filename, len(pdf_bytes))
+    return doc_id
+
+def _write_doc_meta(meta_path: str, filename: str, size: int):
+    # Isi yang sama selalu mendapat doc_id yang sama; metadata dokumen yang sudah ada
+    # (dan mungkin sedang dipakai sesi lain) tidak ditimpa oleh upload dengan nama lain.
+    if os.path.exists(meta_path):
+        return
+    with open(meta_path, "w") as f:
+        json.dump({"filename": filename, "size": size}, f)
+
+def file_sha256(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+def store_document_file(src_path: str, filename: str, digest: Optional[str] = None) -> str:
+    """
+    Pindahkan file PDF yang sudah ada di disk ke document store tanpa menyalin isinya.
+    src_path harus berada di filesystem yang sama dengan DOC_STORE_DIR.
+    'digest' adalah SHA-256 file yang sudah dihitung sebelumnya (jika ada).
+    """
+    purge_expired_documents()
+    doc_id = (digest or file_sha256(src_path))[:32]
+    pdf_path, meta_path = _doc_paths(doc_id)
+    size = os.path.getsize(src_path)
+    if os.path.exists(pdf_path):
+        os.utime(pdf_path)
+        cleanup_file(src_path)
+    else:
+        os.replace(src_path, pdf_path)
+    _write_doc_meta(meta_path, filename, size)
+    return doc_id
+
+def get_document_path(doc_id: str) -> str:
+    """Path file PDF tersimpan; TTL diperpanjang setiap kali dokumen dipakai."""
+    pdf_path, _ = _doc_paths(doc_id)
     try:
-        for part in range_str.split(','):
-            part = part.strip()
-            if '-' in part:
-                start, end = part.split('-')
-                start = int(start.strip())
-                end = int(end.strip())
-                if start < 1 or end > max_pages or start > end:
-                    raise ValueError(f"Rentang '{part}' tidak valid.")
-                # User (1-indexed) -> internal (0-indexed)
-                for i in range(start, end + 1):
-                    pages.add(i - 1)
-            else:
-                page = int(part.strip())
-                if page < 1 or page > max_pages:
-                    raise ValueError(f"Halaman '{page}' di luar rentang.")
-                pages.add(page - 1) # 0-indexed
+        expired = time.time() - os.path.getmtime(pdf_path) > DOC_STORE_TTL
+    except OSError:
+        raise HTTPException(404, "Dokumen tidak ditemukan atau sudah kedaluwarsa. Upload ulang file PDF.")
+    if expired:
+        delete_document(doc_id)
+        raise HTTPException(404, "Dokumen tidak ditemukan atau sudah kedaluwarsa. Upload ulang file PDF.")
+    os.utime(pdf_path)
+    return pdf_path
+
+def get_document_info(doc_id: str) -> dict:
+    get_document_path(doc_id)
+    _, meta_path = _doc_paths(doc_id)
+    with open(meta_path) as f:
+        return json.load(f)
+
+def delete_document(doc_id: str):
+    entry = _doc_cache.pop(doc_id, None)
+    if entry is not None:
+        _close_doc_entry(entry)
+    for path in _doc_paths(doc_id):
+        if os.path.exists(path):
+            cleanup_file(path)
+
+def _get_doc_entry(doc_id: str) -> dict:
+    pdf_path = get_document_path(doc_id)
+    entry = _doc_cache.get(doc_id)
+    if entry is None:
+        entry = {"reader": None, "fitz": None, "thumbs": OrderedDict(), "size": os.path.getsize(pdf_path), "thumb_bytes": 0}
+        _doc_cache[doc_id] = entry
+    _doc_cache.move_to_end(doc_id)
+    return entry
+
+def get_document_reader(doc_id: str) -> PdfReader:
+    """PdfReader yang sudah di-parse untuk dokumen tersimpan (dari cache LRU).
+
+    Reader ini dipakai bersama antar request: jangan ubah halamannya secara langsung,
+    ubah salinan yang dikembalikan oleh PdfWriter.add_page().
+    """
+    entry = _get_doc_entry(doc_id)
+    if entry["reader"] is None:
+        entry["reader"] = PdfReader(get_document_path(doc_id))
+        _evict_doc_cache(keep=doc_id)
+    return entry["reader"]
+
+def get_document_fitz(doc_id: str) -> "fitz.Document":
+    """Dokumen fitz untuk dokumen tersimpan (dari cache LRU)."""
+    entry = _get_doc_entry(doc_id)
+    if entry["fitz"] is None:
+        entry["fitz"] = fitz.open(get_document_path(doc_id))
+        _evict_doc_cache(keep=doc_id)
+    return entry["fitz"]
+
+def document_summary(doc_id: str) -> dict:
+    info = get_document_info(doc_id)
+    reader = get_document_reader(doc_id)
+    return {
+        "doc_id": doc_id,
+        "filename": info["filename"],
+        "size": info["size"],
+        "encrypted": reader.is_encrypted,
+        "page_count": None if reader.is_encrypted else len(reader.pages),
+        "expires_in": DOC_STORE_TTL,
+    }
+
+def render_thumbnail(doc_id: str, page_index: int, width: int) -> bytes:
+    """Render satu halaman menjadi PNG dengan lebar tertentu (memakai cache per dokumen)."""
+    doc = get_document_fitz(doc_id)
+    entry = _doc_cache[doc_id]
+    key = (page_index, width)
+    thumbs = entry["thumbs"]
+    if key in thumbs:
+        thumbs.move_to_end(key)
+        return thumbs[key]
+    page = doc.load_page(page_index)
+    zoom = width / page.rect.width
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    png_bytes = pix.tobytes("png")
+    thumbs[key] = png_bytes
+    entry["thumb_bytes"] += len(png_bytes)
+    while len(thumbs) > THUMBNAIL_MAX_PER_DOC:
+        _, old_png = thumbs.popitem(last=False)
+        entry["thumb_bytes"] -= len(old_png)
+    _evict_doc_cache(keep=doc_id)
+    return png_bytes
+
+def check_pdf_input(file: Optional[UploadFile], doc_id: Optional[str]):
+    if doc_id:
+        return
+    if file is None:
+        raise HTTPException(400, "Kirim 'file' PDF atau 'doc_id' dari /documents.")
+    if file.content_type != "application/pdf":
+        raise HTTPException(400, "Hanya file PDF yang diizinkan.")
+
+async def open_pdf_input(file: Optional[UploadFile], doc_id: Optional[str]) -> Tuple[PdfReader, str]:
+    """PdfReader dan nama file, dari dokumen tersimpan (tanpa parsing ulang) atau dari upload."""
+    check_pdf_input(file, doc_id)
+    if doc_id:
+        return get_document_reader(doc_id), get_document_info(doc_id)["filename"]
+    pdf_bytes = await file.read()
+    try:
+        return PdfReader(BytesIO(pdf_bytes)), file.filename
     except Exception as e:
-        raise HTTPException(
-            400, 
-            f"Format rentang halaman tidak valid: '{range_str}'. Gunakan format seperti '1, 3, 5-7'. Error: {e}"
-        )
-    if not pages:
-         raise HTTPException(400, "Tidak ada halaman yang dipilih.")
-    return pages
+        raise HTTPException(400, f"Error membaca {file.filename}: {e}")
+
+async def pdf_input_path(file: Optional[UploadFile], doc_id: Optional[str]) -> Tuple[str, str, bool]:
+    """
+    Path file PDF di disk untuk library yang butuh path (pdf2docx, camelot, poppler).
+    Dokumen tersimpan dipakai langsung; upload ditulis ke file sementara.
+    Mengembalikan (path, nama file, apakah path harus dihapus setelah dipakai).
+    """
+    check_pdf_input(file, doc_id)
+    if doc_id:
+        return get_document_path(doc_id), get_document_info(doc_id)["filename"], False
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
+        temp_pdf.write(await file.read())
+    return temp_pdf.name, file.filename, True
+
+
+# --- Chunked Upload ---
+# File besar dikirim per potongan (chunk) yang bisa dikirim ulang, tidak berurutan,
+# dan paralel. Potongan langsung ditulis ke posisinya di satu file di disk, lalu
+# file tersebut dipindahkan ke document store saat upload selesai.
+UPLOAD_DIR = os.path.join(DOC_STORE_DIR, "uploads") # harus satu filesystem dengan DOC_STORE_DIR
+UPLOAD_TTL = int(os.getenv("UPLOAD_TTL", "86400")) # detik sejak chunk terakhir
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", str(1024 * 1024 * 1024)))
+UPLOAD_MIN_CHUNK_SIZE = 256 * 1024
+UPLOAD_MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+def _upload_dir(upload_id: str) -> str:
+    if not upload_id.isalnum():
+        raise HTTPException(400, "upload_id tidak valid.")
+    return os.path.join(UPLOAD_DIR, upload_id)
+
+def purge_expired_uploads():
+    now = time.time()
+    for upload_id in os.listdir(UPLOAD_DIR):
+        path = os.path.join(UPLOAD_DIR, upload_id)
+        try:
+            if now - os.path.getmtime(path) > UPLOAD_TTL:
+                cleanup_dir(path)
+        except OSError:
+            pass
+
+def get_upload_meta(upload_id: str) -> dict:
+    path = _upload_dir(upload_id)
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+    except OSError:
+        raise HTTPException(404, "Upload tidak ditemukan atau sudah kedaluwarsa. Mulai upload baru.")
+    if time.time() - os.path.getmtime(path) > UPLOAD_TTL:
+        cleanup_dir(path)
+        raise HTTPException(404, "Upload tidak ditemukan atau sudah kedaluwarsa. Mulai upload baru.")
+    return meta
+
+def received_chunks(upload_id: str) -> List[int]:
+    # Setiap chunk yang sudah diverifikasi ditandai dengan file kosong, jadi
+    # beberapa worker bisa menerima chunk dari upload yang sama tanpa saling menimpa.
+    chunk_dir = os.path.join(_upload_dir(upload_id), "chunks")
+    return sorted(int(name) for name in os.listdir(chunk_dir))
+
+
+# --- Output File ---
+# Semua hasil ditulis ke file di disk lalu dikirim dengan FileResponse, sehingga
+# respons punya Content-Length, ETag, dan mendukung Range (download bisa dilanjutkan)
+# tanpa menyimpan salinan hasil di memori. File hasil tetap bisa diambil lewat
+# GET /outputs/{output_id} (lihat header Content-Location) selama OUTPUT_TTL detik.
+OUTPUT_DIR = os.path.join(DOC_STORE_DIR, "outputs")
+OUTPUT_TTL = int(os.getenv("OUTPUT_TTL", "900")) # 0 = hapus langsung setelah dikirim
+# Dengan OUTPUT_TTL=0 file dihapus oleh BackgroundTask setelah terkirim; purge hanya
+# menghapus sisa yang lebih tua dari ini, supaya file yang masih ditulis, sedang
+# dikirim, atau belum diambil (mode progress) tidak ikut terhapus.
+OUTPUT_GRACE_PERIOD = int(os.getenv("OUTPUT_GRACE_PERIOD", "3600")) # detik
+
+os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+def purge_expired_outputs():
+    now = time.time()
+    max_age = OUTPUT_TTL if OUTPUT_TTL > 0 else OUTPUT_GRACE_PERIOD
+    for name in os.listdir(OUTPUT_DIR):
+        path = os.path.join(OUTPUT_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                os.remove(path)
+        except OSError:
+            pass
+
+def new_output_path(suffix: str) -> str:
+    """Path baru di OUTPUT_DIR untuk menulis hasil operasi."""
+    purge_expired_outputs()
+    return os.path.join(OUTPUT_DIR, uuid.uuid4().hex + suffix)
+
+def register_output(path: str, filename: str, media_type: str) -> str:
+    """Simpan metadata file hasil supaya bisa diambil lewat GET /outputs/{output_id}."""
+    output_id = os.path.basename(path)
+    with open(path + ".json", "w") as f:
+        json.dump({"filename": filename, "media_type": media_type}, f)
+    return output_id
+
+def output_response(path: str, filename: str, media_type: str) -> FileResponse:
+    """Kirim file hasil dari OUTPUT_DIR sebagai attachment."""
+    output_id = register_output(path, filename, media_type)
+    background = None
+    if OUTPUT_TTL <= 0:
+        background = BackgroundTask(cleanup_output, output_id=output_id)
+    return FileResponse(
+        path=path,
+        media_type=media_type,
+        filename=filename,
+        headers={"Content-Location": f"/outputs/{output_id}"},
+        background=background
+    )
+
+def cleanup_output(output_id: str):
+    path = os.path.join(OUTPUT_DIR, output_id)
+    for p in (path, path + ".json"):
+        if os.path.exists(p):
+            cleanup_file(p)
+
+def pdf_output_response(writer: PdfWriter, filename: str, optimize: str = "none") -> FileResponse:
+    output_path = new_output_path(".pdf")
+    with open(output_path, "wb") as f:
+        writer.write(f)
+    optimize_pdf_file(output_path, optimize)
+    return output_response(output_path, filename, "application/pdf")
+
+
+# --- Progress (Server-Sent Events) ---
+# Konversi panjang (/to-word, /to-excel, /to-images, /to-powerpoint) bisa dikirim
+# dengan progress=true. Konversi lalu berjalan di thread dan respons berupa
+# text/event-stream:
+#   event: progress  {"stage", "done", "total", "percent", "elapsed", "eta"}
+#   event: done      {"download": "/outputs/{id}", "filename", "media_type", "size", "elapsed", "headers"}
+#   event: error     {"status_code", "detail"}
+# 'eta' adalah perkiraan detik tersisa untuk tahap yang sedang berjalan. Event
+# progress dibatasi paling sering tiap PROGRESS_INTERVAL detik per tahap, jadi
+# biayanya kecil walaupun callback dipanggil per halaman. Link download berlaku
+# selama OUTPUT_TTL detik (dengan OUTPUT_TTL=0: sampai diambil sekali, paling lama
+# OUTPUT_GRACE_PERIOD detik).
+PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "0.25"))
+PROGRESS_KEEPALIVE = 15 # detik; komentar SSE supaya proxy tidak memutus koneksi
+
+class ConversionCancelled(Exception):
+    """Dilempar di thread konversi saat stream progres sudah ditutup (klien putus)."""
+
+def memory_checkpoint() -> Optional[ops.ProgressCallback]:
+    """
+    Callback progress yang hanya mengecek batas memori request ini (None jika batas
+    tidak aktif). Operasi yang menerimanya berhenti di halaman berikutnya setelah
+    request melewati MEMORY_CEILING, walaupun berjalan sinkron.
+    """
+    usage = memory_guard.current_request()
+    if usage is None or not memory_guard.MEMORY_CEILING:
+        return None
+    return lambda stage, done, total: usage.check()
+
+class ProgressReporter:
+    """
+    Callback progress(stage, done, total) untuk pdf_operations, dipanggil dari thread konversi.
+    Jika cancelled diset, panggilan berikutnya menghentikan konversi di thread itu sendiri;
+    begitu juga jika request melewati batas memori.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue,
+                 memory: Optional["memory_guard.RequestMemory"] = None):
+        self.loop = loop
+        self.queue = queue
+        self.memory = memory
+        self.start = time.monotonic()
+        self.stage = None
+        self.stage_start = self.start
+        self.last_call = self.start
+        self.last_sent = 0.0
+        self.cancelled = False
+
+    def __call__(self, stage: str, done: int, total: int):
+        if self.cancelled:
+            raise ConversionCancelled("Konversi dibatalkan.")
+        if self.memory is not None:
+            self.memory.check()
+        now = time.monotonic()
+        previous_call, self.last_call = self.last_call, now
+        if stage != self.stage:
+            # Tahap berjalan berurutan: tahap baru dimulai saat laporan terakhir tahap sebelumnya
+            self.stage, self.stage_start = stage, previous_call
+        elif done < total and now - self.last_sent < PROGRESS_INTERVAL:
+            return
+        self.last_sent = now
+        stage_elapsed = now - self.stage_start
+        event = {
+            "stage": stage,
+            "done": done,
+            "total": total,
+            "percent": round(100 * done / total, 1) if total else 100.0,
+            "elapsed": round(now - self.start, 2),
+            "eta": round(stage_elapsed / done * (total - done), 1) if done else None,
+        }
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, ("progress", event))
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def run_in_thread(func, *args) -> asyncio.Future:
+    """
+    Jalankan pekerjaan berat di thread supaya event loop tetap melayani request lain.
+    Error dari thread yang tidak lagi ditunggu (request sudah dibatalkan) diabaikan.
+    """
+    future = asyncio.get_running_loop().run_in_executor(None, func, *args)
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    memory_guard.track_thread(future)
+    return future
+
+async def conversion_response(convert, progress: bool, error_message: str):
+    """
+    convert(report) menjalankan konversi dan mengembalikan (path, filename, media_type, headers).
+    Konversi selalu berjalan di thread supaya event loop tetap melayani request lain.
+    Tanpa progress: langsung dikirim sebagai file. Dengan progress: stream SSE yang
+    diakhiri link download. error_message dipakai untuk error tak terduga, dengan '{e}'.
+    """
+    loop = asyncio.get_running_loop()
+    memory = memory_guard.current_request() if memory_guard.MEMORY_CEILING else None
+
+    if not progress:
+        try:
+            path, filename, media_type, headers = await run_in_thread(convert, memory_checkpoint())
+        except HTTPException:
+            raise
+        except memory_guard.MemoryCeilingExceeded as e:
+            raise HTTPException(507, str(e))
+        except PdfOperationError as e:
+            raise HTTPException(e.status_code, str(e))
+        except Exception as e:
+            raise HTTPException(500, error_message.format(e=e))
+        response = output_response(path, filename, media_type)
+        response.headers.update(headers)
+        return response
+
+    async def events():
+        queue = asyncio.Queue()
+        reporter = ProgressReporter(loop, queue, memory)
+
+        def run():
+            path, filename, media_type, headers = convert(reporter)
+            register_output(path, filename, media_type)
+            return path, filename, media_type, headers
+
+        future = run_in_thread(run)
+        # Dijadwalkan setelah semua event progress dari thread masuk ke antrean
+        future.add_done_callback(lambda _: queue.put_nowait(("end", None)))
+        try:
+            while True:
+                try:
+                    kind, data = await asyncio.wait_for(queue.get(), PROGRESS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if kind == "end":
+                    break
+                yield sse_event(kind, data)
+        finally:
+            # Stream ditutup sebelum selesai: hentikan konversi di halaman berikutnya
+            if not future.done():
+                reporter.cancelled = True
+
+        try:
+            path, filename, media_type, headers = future.result()
+        except HTTPException as e:
+            yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+            return
+        except memory_guard.MemoryCeilingExceeded as e:
+            yield sse_event("error", {"status_code": 507, "detail": str(e)})
+            return
+        except PdfOperationError as e:
+            yield sse_event("error", {"status_code": e.status_code, "detail": str(e)})
+            return
+        except Exception as e:
+            yield sse_event("error", {"status_code": 500, "detail": error_message.format(e=e)})
+            return
+        yield sse_event("done", {
+            "download": f"/outputs/{os.path.basename(path)}",
+            "filename": filename,
+            "media_type": media_type,
+            "size": os.path.getsize(path),
+            "elapsed": round(time.monotonic() - reporter.start, 2),
+            "headers": headers,
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# --- Optimasi PDF ---
+# Detail tiap level ada di pdf_operations.OPTIMIZE_LEVELS.
+def check_optimize_level(level: str):
+    if level not in OPTIMIZE_LEVELS:
+        raise HTTPException(400, f"Level optimasi harus salah satu dari: {', '.join(OPTIMIZE_LEVELS)}.")
+
+def optimize_pdf_file(path: str, level: str):
+    """Optimasi file PDF di tempat; tidak melakukan apa-apa untuk level 'none'."""
+    if OPTIMIZE_LEVELS[level] is None:
+        return
+    optimized_path = path + ".opt"
+    ops.optimize_pdf(path, optimized_path, level)
+    # Hasil optimasi bisa sedikit lebih besar untuk file kecil yang sudah ringkas
+    if os.path.getsize(optimized_path) < os.path.getsize(path):
+        os.replace(optimized_path, path)
+    else:
+        os.remove(optimized_path)
+
+
+# --- Batch ---
+# Satu operasi dijalankan untuk banyak PDF di process pool. Setiap job menerima path
+# file input dan folder output, lalu mengembalikan daftar (nama di ZIP, path file hasil).
+# Error dari pdf_operations tidak menghentikan batch, tapi dicatat di manifest.
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 2)))
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "500"))
+# Berapa kali job yang belum mulai boleh dikirim ulang setelah pool rusak
+# sebelum dijalankan sendirian (lihat stream_zip di /batch)
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "2"))
+
+# Server punya thread lain (thread konversi, monitor memori); worker yang di-fork
+# bisa mewarisi lock yang sedang dipegang thread itu lalu macet, jadi jangan pakai fork.
+BATCH_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+if BATCH_MP_CONTEXT.get_start_method() == "forkserver":
+    # Library berat (fitz, pdf2docx, camelot) diimpor sekali di proses forkserver
+    BATCH_MP_CONTEXT.set_forkserver_preload(["pdf_operations"])
+
+_batch_pool: Optional[ProcessPoolExecutor] = None
+
+def get_batch_pool() -> ProcessPoolExecutor:
+    global _batch_pool
+    if _batch_pool is None:
+        _batch_pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=BATCH_MP_CONTEXT)
+    return _batch_pool
+
+def reset_batch_pool(pool: ProcessPoolExecutor):
+    """Buang pool yang rusak (worker mati karena OOM kill / segfault) supaya request berikutnya dapat pool baru."""
+    global _batch_pool
+    if _batch_pool is pool:
+        _batch_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _batch_write(writer: PdfWriter, out_dir: str, name: str) -> List[Tuple[str, str]]:
+    path = os.path.join(out_dir, name)
+    ops.write_pdf(writer, path)
+    return [(name, path)]
+
+def batch_watermark(src_path: str, out_dir: str, filename: str, params: dict):
+    return _batch_write(ops.watermark_pdf(src_path, params["text"]), out_dir, f"watermarked_{filename}")
+
+def batch_lock(src_path: str, out_dir: str, filename: str, params: dict):
+    return _batch_write(ops.lock_pdf(src_path, params["password"]), out_dir, f"locked_{filename}")
+
+def batch_unlock(src_path: str, out_dir: str, filename: str, params: dict):
+    return _batch_write(ops.unlock_pdf(src_path, params["password"]), out_dir, f"unlocked_{filename}")
+
+def batch_rotate(src_path: str, out_dir: str, filename: str, params: dict):
+    return _batch_write(ops.rotate_pdf(src_path, params["angle"]), out_dir, f"rotated_{filename}")
+
+def batch_compress(src_path: str, out_dir: str, filename: str, params: dict):
+    path = os.path.join(out_dir, f"compressed_{filename}")
+    ops.compress_pdf(src_path, path, params["level"])
+    return [(os.path.basename(path), path)]
+
+def batch_to_images(src_path: str, out_dir: str, filename: str, params: dict):
+    stem = os.path.splitext(filename)[0]
+    return [(f"{stem}/{os.path.basename(path)}", path) for path in ops.pdf_to_images(src_path, out_dir)]
+
+def batch_to_word(src_path: str, out_dir: str, filename: str, params: dict):
+    path = os.path.join(out_dir, f"{os.path.splitext(filename)[0]}.docx")
+    ops.pdf_to_word(src_path, path, params.get("mode", "layout"))
+    return [(os.path.basename(path), path)]
+
+# operasi -> (fungsi job, validasi parameter)
+def _require_text(params: dict, key: str) -> dict:
+    if not isinstance(params.get(key), str) or not params[key]:
+        raise HTTPException(400, f"Parameter '{key}' wajib diisi untuk operasi ini.")
+    return {key: params[key]}
+
+def _check_angle(params: dict) -> dict:
+    if params.get("angle") not in [90, 180, 270]:
+        raise HTTPException(400, "Sudut rotasi harus 90, 180, or 270.")
+    return {"angle": params["angle"]}
+
+def _check_level(params: dict) -> dict:
+    level = params.get("level", "medium")
+    check_optimize_level(level)
+    if level == "none":
+        raise HTTPException(400, "Level kompresi harus 'low', 'medium', atau 'high'.")
+    return {"level": level}
+
+def _check_word_mode(params: dict) -> dict:
+    mode = params.get("mode", "layout")
+    if mode not in ops.WORD_MODES:
+        raise HTTPException(400, "Mode harus 'layout', 'fast', atau 'auto'.")
+    return {"mode": mode}
+
+BATCH_OPERATIONS = {
+    "watermark": (batch_watermark, lambda p: _require_text(p, "text")),
+    "lock": (batch_lock, lambda p: _require_text(p, "password")),
+    "unlock": (batch_unlock, lambda p: _require_text(p, "password")),
+    "rotate": (batch_rotate, _check_angle),
+    "compress": (batch_compress, _check_level),
+    "to-images": (batch_to_images, lambda p: {}),
+    "to-word": (batch_to_word, _check_word_mode),
+}
+
+def run_batch_job(operation: str, src_path: str, out_dir: str, filename: str, params: dict) -> dict:
+    """Dijalankan di worker process. Error tidak dilempar, tapi dikembalikan untuk manifest."""
+    start = time.time()
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        outputs = BATCH_OPERATIONS[operation][0](src_path, out_dir, filename, params)
+        return {"ok": True, "outputs": outputs, "seconds": round(time.time() - start, 3)}
+    except Exception as e:
+        return {"ok": False, "error": str(e) or e.__class__.__name__, "seconds": round(time.time() - start, 3)}
+
+class ZipStreamBuffer:
+    """Target tulis untuk zipfile yang isinya diambil sedikit demi sedikit untuk di-stream."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
 
 
 # --- API Endpoints ---
@@ -120,181 +748,165 @@ def read_root():
     return {"message": "BigPDF API is running. Docs at /docs"}
 
 
+@app.get("/metrics", summary="Statistik memori per endpoint")
+def get_metrics():
+    """
+    Puncak kenaikan memori (byte) per endpoint. Hanya terisi jika
+    MEMORY_ACCOUNTING=1 atau MEMORY_CEILING diatur.
+    """
+    return {"memory": memory_guard.memory_metrics()}
+
+
 @app.post("/merge", summary="Gabungkan beberapa PDF")
-async def merge_pdfs(files: List[UploadFile] = File(..., description="File PDF yang akan digabung")):
-    # (Kode tidak berubah)
-    merger = PdfWriter()
-    for file in files:
-        if file.content_type != "application/pdf":
-            raise HTTPException(400, "Hanya file PDF yang diizinkan.")
-        pdf_bytes = await file.read()
-        try:
-            reader = PdfReader(BytesIO(pdf_bytes))
-            if reader.is_encrypted:
-                raise HTTPException(400, f"File {file.filename} terenkripsi. Harap buka sandi terlebih dahulu.")
-            merger.append(BytesIO(pdf_bytes))
-        except Exception as e:
-            raise HTTPException(400, f"Error membaca {file.filename}: {e}")
-    output_io = BytesIO()
-    merger.write(output_io)
-    merger.close()
-    output_io.seek(0)
-    return StreamingResponse(
-        output_io,
-        media_type="application/pdf",
-        headers={"Content-Disposition": "attachment; filename=merged.pdf"}
-    )
+async def merge_pdfs(
+    files: List[UploadFile] = File(None, description="File PDF yang akan digabung"),
+    doc_ids: str = Form(None, description="doc_id dokumen tersimpan, dipisah koma (digabung setelah 'files')"),
+    optimize: str = Form("none", description="Optimasi ukuran output: 'none', 'low', 'medium', 'high' (lihat /compress).")
+):
+    check_optimize_level(optimize)
+    sources = [(file, None) for file in files or []]
+    sources += [(None, d.strip()) for d in (doc_ids or "").split(",") if d.strip()]
+    if not sources:
+        raise HTTPException(400, "Kirim 'files' PDF atau 'doc_ids' dari /documents.")
+    readers, names = [], []
+    for file, doc_id in sources:
+        reader, filename = await open_pdf_input(file, doc_id)
+        readers.append(reader)
+        names.append(filename)
+    try:
+        merger = ops.merge_pdfs(readers, names, memory_checkpoint())
+        response = pdf_output_response(merger, "merged.pdf", optimize)
+        merger.close()
+        return response
+    except PdfOperationError as e:
+        raise HTTPException(e.status_code, str(e))
+    except memory_guard.MemoryCeilingExceeded as e:
+        raise HTTPException(507, str(e))
 
 
 @app.post("/to-word", summary="Konversi PDF ke Word (.docx)")
-async def pdf_to_word(file: UploadFile = File(..., description="File PDF yang akan dikonversi")):
-    # (Kode tidak berubah)
-    if file.content_type != "application/pdf":
-        raise HTTPException(400, "Hanya file PDF yang diizinkan.")
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
-            content = await file.read()
-            temp_pdf.write(content)
-            temp_pdf_path = temp_pdf.name
-        output_path = tempfile.mktemp(suffix=".docx")
-        cv = Converter(temp_pdf_path)
-        cv.convert(output_path, start=0, end=None)
-        cv.close()
-        os.remove(temp_pdf_path)
-        return FileResponse(
-            path=output_path,
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            filename=f"{os.path.splitext(file.filename)[0]}.docx",
-            background=BackgroundTask(cleanup_file, path=output_path)
+async def pdf_to_word(
+    file: UploadFile = File(None, description="File PDF yang akan dikonversi"),
+    mode: str = Form("layout", description="'layout' (pdf2docx, tata letak lengkap), 'fast' (teks saja, jauh lebih cepat), atau 'auto' ('fast' jika tidak ada gambar/tabel bergaris)."),
+    doc_id: str = Form(None, description="doc_id dokumen tersimpan (pengganti 'file')"),
+    progress: bool = Form(False, description="Kirim progres per halaman sebagai Server-Sent Events; event terakhir berisi link download."),
+):
+    """
+    Mode yang benar-benar dipakai dikirim di header X-Word-Mode.
+    """
+    check_pdf_input(file, doc_id)
+    if mode not in ops.WORD_MODES:
+        raise HTTPException(400, "Mode harus 'layout', 'fast', atau 'auto'.")
+
+    temp_pdf_path, filename, is_temp = await pdf_input_path(file, doc_id)
+
+    def convert(report):
+        output_path = new_output_path(".docx")
+        try:
+            used_mode = ops.pdf_to_word(temp_pdf_path, output_path, mode, report)
+        except Exception:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+        finally:
+            if is_temp:
+                cleanup_file(temp_pdf_path)
+        return (
+            output_path,
+            f"{os.path.splitext(filename)[0]}.docx",
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            {"X-Word-Mode": used_mode}
         )
-    except Exception as e:
-        if 'temp_pdf_path' in locals() and os.path.exists(temp_pdf_path):
-            os.remove(temp_pdf_path)
-        if 'output_path' in locals() and os.path.exists(output_path):
-            os.remove(output_path)
-        raise HTTPException(500, f"Terjadi error saat konversi: {e}")
+
+    return await conversion_response(convert, progress, "Terjadi error saat konversi: {e}")
 
 
 @app.post("/to-images", summary="Konversi PDF ke Gambar (ZIP)")
-async def pdf_to_images(file: UploadFile = File(..., description="File PDF yang akan dikonversi")):
-    # (Kode tidak berubah)
-    if file.content_type != "application/pdf":
-        raise HTTPException(400, "Hanya file PDF yang diizinkan.")
-    try:
+async def pdf_to_images(
+    file: UploadFile = File(None, description="File PDF yang akan dikonversi"),
+    doc_id: str = Form(None, description="doc_id dokumen tersimpan (pengganti 'file')"),
+    progress: bool = Form(False, description="Kirim progres per halaman sebagai Server-Sent Events; event terakhir berisi link download."),
+):
+    pdf_path, filename, is_temp = await pdf_input_path(file, doc_id)
+
+    def convert(report):
         temp_dir = tempfile.mkdtemp()
-        pdf_bytes = await file.read()
-        images = convert_from_bytes(pdf_bytes, output_folder=temp_dir, fmt='png')
-        zip_io = BytesIO()
-        with zipfile.ZipFile(zip_io, 'w') as zf:
-            for i, image_path in enumerate(os.listdir(temp_dir)):
-                full_path = os.path.join(temp_dir, image_path)
-                new_filename = f"page_{i+1}.png"
-                zf.write(full_path, arcname=new_filename)
-        zip_io.seek(0)
-        return StreamingResponse(
-            zip_io,
-            media_type="application/zip",
-            headers={"Content-Disposition": f"attachment; filename={os.path.splitext(file.filename)[0]}.zip"},
-            background=BackgroundTask(cleanup_dir, path=temp_dir)
-        )
-    except Exception as e:
-        if 'temp_dir' in locals() and os.path.exists(temp_dir):
+        try:
+            image_paths = ops.pdf_to_images(pdf_path, temp_dir, report)
+            output_path = new_output_path(".zip")
+            with zipfile.ZipFile(output_path, 'w') as zf:
+                for i, image_path in enumerate(image_paths):
+                    zf.write(image_path, arcname=os.path.basename(image_path))
+                    if report:
+                        report("zip", i + 1, len(image_paths))
+        finally:
             cleanup_dir(temp_dir)
-        raise HTTPException(500, f"Terjadi error saat konversi ke gambar: {e}. Pastikan Poppler terinstal.")
+            if is_temp:
+                cleanup_file(pdf_path)
+        return output_path, f"{os.path.splitext(filename)[0]}.zip", "application/zip", {}
+
+    return await conversion_response(
+        convert, progress, "Terjadi error saat konversi ke gambar: {e}. Pastikan Poppler terinstal."
+    )
 
 
 @app.post("/watermark", summary="Tambahkan watermark ke PDF")
 async def add_watermark(
-    file: UploadFile = File(..., description="File PDF utama."),
-    text: str = Form(..., description="Teks untuk watermark.")
+    file: UploadFile = File(None, description="File PDF utama."),
+    text: str = Form(..., description="Teks untuk watermark."),
+    doc_id: str = Form(None, description="doc_id dokumen tersimpan (pengganti 'file')"),
+    optimize: str = Form("none", description="Optimasi ukuran output: 'none', 'low', 'medium', 'high' (lihat /compress).")
 ):
-    # (Kode tidak berubah)
-    if file.content_type != "application/pdf":
-        raise HTTPException(400, "Hanya file PDF yang diizinkan.")
+    check_optimize_level(optimize)
+    pdf_reader, filename = await open_pdf_input(file, doc_id)
     try:
-        pdf_bytes = await file.read()
-        pdf_reader = PdfReader(BytesIO(pdf_bytes))
-        if pdf_reader.is_encrypted:
-            raise HTTPException(400, "File PDF terenkripsi. Buka sandi terlebih dahulu.")
-        watermark_io = create_watermark_pdf(text)
-        watermark_reader = PdfReader(watermark_io)
-        watermark_page = watermark_reader.pages[0]
-        writer = PdfWriter()
-        for page in pdf_reader.pages:
-            page.merge_page(watermark_page)
-            writer.add_page(page)
-        output_io = BytesIO()
-        writer.write(output_io)
-        output_io.seek(0)
-        return StreamingResponse(
-            output_io,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=watermarked_{file.filename}"}
-        )
+        writer = ops.watermark_pdf(pdf_reader, text)
+        return pdf_output_response(writer, f"watermarked_{filename}", optimize)
+    except PdfOperationError as e:
+        raise HTTPException(e.status_code, str(e))
     except Exception as e:
         raise HTTPException(500, f"Terjadi error: {e}")
 
 
 @app.post("/lock", summary="Kunci PDF dengan sandi")
 async def lock_pdf(
-    file: UploadFile = File(..., description="File PDF yang akan dikunci."),
-    password: str = Form(..., description="Sandi untuk PDF.")
+    file: UploadFile = File(None, description="File PDF yang akan dikunci."),
+    password: str = Form(..., description="Sandi untuk PDF."),
+    doc_id: str = Form(None, description="doc_id dokumen tersimpan (pengganti 'file')")
 ):
-    # (Kode tidak berubah)
-    if file.content_type != "application/pdf":
-        raise HTTPException(400, "Hanya file PDF yang diizinkan.")
+    reader, filename = await open_pdf_input(file, doc_id)
     try:
-        pdf_bytes = await file.read()
-        reader = PdfReader(BytesIO(pdf_bytes))
-        if reader.is_encrypted:
-            raise HTTPException(400, "File sudah terenkripsi.")
-        writer = PdfWriter()
-        for page in reader.pages:
-            writer.add_page(page)
-        writer.encrypt(password)
-        output_io = BytesIO()
-        writer.write(output_io)
-        output_io.seek(0)
-        return StreamingResponse(
-            output_io,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=locked_{file.filename}"}
-        )
+        writer = ops.lock_pdf(reader, password)
+        return pdf_output_response(writer, f"locked_{filename}")
+    except PdfOperationError as e:
+        raise HTTPException(e.status_code, str(e))
     except Exception as e:
         raise HTTPException(500, f"Terjadi error: {e}")
 
 
 @app.post("/unlock", summary="Hapus sandi dari PDF")
 async def unlock_pdf(
-    file: UploadFile = File(..., description="File PDF yang akan dibuka."),
-    password: str = Form(..., description="Sandi PDF yang benar.")
+    file: UploadFile = File(None, description="File PDF yang akan dibuka."),
+    password: str = Form(..., description="Sandi PDF yang benar."),
+    doc_id: str = Form(None, description="doc_id dokumen tersimpan (pengganti 'file')"),
+    optimize: str = Form("none", description="Optimasi ukuran output: 'none', 'low', 'medium', 'high' (lihat /compress).")
 ):
-    # (Kode perbaikan terakhir, tidak berubah)
-    if file.content_type != "application/pdf":
-        raise HTTPException(400, "Hanya file PDF yang diizinkan.")
+    check_optimize_level(optimize)
+    check_pdf_input(file, doc_id)
     try:
-        pdf_bytes = await file.read()
-        reader = PdfReader(BytesIO(pdf_bytes))
-        if not reader.is_encrypted:
-            raise HTTPException(400, "File tidak terenkripsi.")
-        
-        result = reader.decrypt(password)
-        if result == PasswordType.NOT_DECRYPTED:
-             raise HTTPException(403, "Sandi salah.")
-
-        writer = PdfWriter()
-        for page in reader.pages:
-            writer.add_page(page)
-        output_io = BytesIO()
-        writer.write(output_io)
-        output_io.seek(0)
-        return StreamingResponse(
-            output_io,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=unlocked_{file.filename}"}
-        )
+        # decrypt() mengubah state reader, jadi reader dari cache tidak dipakai di sini
+        if doc_id:
+            filename = get_document_info(doc_id)["filename"]
+            source = get_document_path(doc_id)
+        else:
+            filename = file.filename
+            source = BytesIO(await file.read())
+        writer = ops.unlock_pdf(source, password)
+        return pdf_output_response(writer, f"unlocked_{filename}", optimize)
     except HTTPException as e:
         raise e
+    except PdfOperationError as e:
+        raise HTTPException(e.status_code, str(e))
     except Exception as e:
         raise HTTPException(500, f"Gagal mendekripsi: {e}. Pastikan sandi benar.")
 
@@ -302,38 +914,22 @@ async def unlock_pdf(
 # --- ENDPOINT LAMA DIGANTI DENGAN YANG INI ---
 @app.post("/split", summary="Pisahkan PDF berdasarkan rentang halaman")
 async def split_pdf_flexible(
-    file: UploadFile = File(..., description="File PDF yang akan dipisah."),
-    page_range: str = Form(..., description="Halaman yang akan diekstrak (cth: '6' atau '1-3, 5')")
+    file: UploadFile = File(None, description="File PDF yang akan dipisah."),
+    page_range: str = Form(..., description="Halaman yang akan diekstrak (cth: '6' atau '1-3, 5')"),
+    doc_id: str = Form(None, description="doc_id dokumen tersimpan (pengganti 'file')"),
+    optimize: str = Form("none", description="Optimasi ukuran output: 'none', 'low', 'medium', 'high' (lihat /compress).")
 ):
     """
     Ekstrak halaman berdasarkan rentang (cth: '1, 3, 5-7')
     dan kembalikan ZIP berisi 2 file: 'extracted.pdf' dan 'remaining.pdf'.
     """
-    if file.content_type != "application/pdf":
-        raise HTTPException(400, "Hanya file PDF yang diizinkan.")
+    check_optimize_level(optimize)
+    reader, filename = await open_pdf_input(file, doc_id)
 
     try:
         temp_dir = tempfile.mkdtemp()
-        pdf_bytes = await file.read()
-        reader = PdfReader(BytesIO(pdf_bytes))
-
-        if reader.is_encrypted:
-            raise HTTPException(400, "File PDF terenkripsi. Buka sandi terlebih dahulu.")
-        
-        total_pages = len(reader.pages)
-        
-        # Dapatkan set halaman (0-indexed) yang akan diekstrak
-        extracted_indices = parse_page_range(page_range, total_pages)
-        
-        writer_extracted = PdfWriter()
-        writer_remaining = PdfWriter()
 
-        # Loop semua halaman, pisahkan ke 2 writer
-        for i in range(total_pages):
-            if i in extracted_indices:
-                writer_extracted.add_page(reader.pages[i])
-            else:
-                writer_remaining.add_page(reader.pages[i])
+        writer_extracted, writer_remaining = ops.split_pdf(reader, page_range)
 
         # Simpan file ke direktori sementara
         path_extracted = os.path.join(temp_dir, "extracted_pages.pdf")
@@ -341,33 +937,27 @@ async def split_pdf_flexible(
         
         # Hanya simpan file jika berisi halaman
         if len(writer_extracted.pages) > 0:
-            with open(path_extracted, "wb") as f_ext:
-                writer_extracted.write(f_ext)
+            ops.write_pdf(writer_extracted, path_extracted)
+            optimize_pdf_file(path_extracted, optimize)
                 
         if len(writer_remaining.pages) > 0:
-            with open(path_remaining, "wb") as f_rem:
-                writer_remaining.write(f_rem)
+            ops.write_pdf(writer_remaining, path_remaining)
+            optimize_pdf_file(path_remaining, optimize)
         
-        # Buat file ZIP di memori
-        zip_io = BytesIO()
-        with zipfile.ZipFile(zip_io, 'w') as zf:
+        # Buat file ZIP hasil
+        output_path = new_output_path(".zip")
+        with zipfile.ZipFile(output_path, 'w') as zf:
             if os.path.exists(path_extracted):
                 zf.write(path_extracted, arcname="halaman_ekstrak.pdf")
             if os.path.exists(path_remaining):
                 zf.write(path_remaining, arcname="halaman_sisa.pdf")
-        
-        zip_io.seek(0)
+        cleanup_dir(temp_dir)
 
-        return StreamingResponse(
-            zip_io,
-            media_type="application/zip",
-            headers={"Content-Disposition": f"attachment; filename=split_{file.filename}.zip"},
-            background=BackgroundTask(cleanup_dir, path=temp_dir)
-        )
-    except HTTPException as e:
+        return output_response(output_path, f"split_{filename}.zip", "application/zip")
+    except PdfOperationError as e:
         if 'temp_dir' in locals() and os.path.exists(temp_dir):
             cleanup_dir(temp_dir)
-        raise e # Tampilkan error spesifik dari parse_page_range
+        raise HTTPException(e.status_code, str(e)) # Tampilkan error spesifik dari parse_page_range
     except Exception as e:
         if 'temp_dir' in locals() and os.path.exists(temp_dir):
             cleanup_dir(temp_dir)
@@ -376,96 +966,69 @@ async def split_pdf_flexible(
 
 @app.post("/rotate", summary="Rotasi halaman PDF")
 async def rotate_pdf(
-    file: UploadFile = File(..., description="File PDF yang akan dirotasi."),
-    angle: int = Form(..., description="Sudut rotasi (hanya 90, 180, 270)")
+    file: UploadFile = File(None, description="File PDF yang akan dirotasi."),
+    angle: int = Form(..., description="Sudut rotasi (hanya 90, 180, 270)"),
+    doc_id: str = Form(None, description="doc_id dokumen tersimpan (pengganti 'file')"),
+    optimize: str = Form("none", description="Optimasi ukuran output: 'none', 'low', 'medium', 'high' (lihat /compress).")
 ):
-    # (Kode tidak berubah)
-    if file.content_type != "application/pdf":
-        raise HTTPException(400, "Hanya file PDF yang diizinkan.")
+    check_optimize_level(optimize)
     if angle not in [90, 180, 270]:
         raise HTTPException(400, "Sudut rotasi harus 90, 180, or 270.")
+    reader, filename = await open_pdf_input(file, doc_id)
     try:
-        pdf_bytes = await file.read()
-        reader = PdfReader(BytesIO(pdf_bytes))
-        if reader.is_encrypted:
-            raise HTTPException(400, "File PDF terenkripsi. Buka sandi terlebih dahulu.")
-        writer = PdfWriter()
-        for page in reader.pages:
-            page.rotate(angle)
-            writer.add_page(page)
-        output_io = BytesIO()
-        writer.write(output_io)
-        output_io.seek(0)
-        return StreamingResponse(
-            output_io,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=rotated_{file.filename}"}
-        )
+        writer = ops.rotate_pdf(reader, angle)
+        return pdf_output_response(writer, f"rotated_{filename}", optimize)
+    except PdfOperationError as e:
+        raise HTTPException(e.status_code, str(e))
     except Exception as e:
         raise HTTPException(500, f"Terjadi error: {e}")
 
 
 # --- FITUR BARU ---
 @app.post("/to-powerpoint", summary="Konversi PDF ke PowerPoint (.pptx)")
-async def pdf_to_powerpoint(file: UploadFile = File(..., description="File PDF yang akan dikonversi")):
+async def pdf_to_powerpoint(
+    file: UploadFile = File(None, description="File PDF yang akan dikonversi"),
+    doc_id: str = Form(None, description="doc_id dokumen tersimpan (pengganti 'file')"),
+    progress: bool = Form(False, description="Kirim progres per halaman sebagai Server-Sent Events; event terakhir berisi link download."),
+):
     """
     Mengkonversi PDF ke PowerPoint.
     CATATAN: Setiap halaman PDF akan menjadi GAMBAR di setiap slide.
     Teks tidak dapat diedit.
     """
-    if file.content_type != "application/pdf":
-        raise HTTPException(400, "Hanya file PDF yang diizinkan.")
+    check_pdf_input(file, doc_id)
+    # Ingat, ini membutuhkan POPOPPLER
+    pdf_path, filename, is_temp = await pdf_input_path(file, doc_id)
 
-    try:
-        # Baca PDF dari bytes
-        pdf_bytes = await file.read()
-        
-        # Konversi PDF ke list gambar (Pillow)
-        # Ingat, ini membutuhkan POPOPPLER
-        images = convert_from_bytes(pdf_bytes)
-        
-        prs = Presentation()
-        # Dapatkan ukuran slide default (landscape 10x7.5 inch)
-        slide_width = prs.slide_width
-        slide_height = prs.slide_height
-
-        for img in images:
-            # Layout 6 adalah layout kosong (blank) 
-            blank_slide_layout = prs.slide_layouts[6] 
-            slide = prs.slides.add_slide(blank_slide_layout)
-
-            # Simpan gambar dari Pillow ke buffer memori
-            img_io = BytesIO()
-            img.save(img_io, format='PNG')
-            img_io.seek(0)
-            
-            # Tambahkan gambar, paskan ke tinggi slide
-            pic = slide.shapes.add_picture(img_io, Inches(0), Inches(0), height=slide_height)
-            
-            # Atur posisi gambar agar di tengah (horizontal)
-            pic.left = int((slide_width - pic.width) / 2)
-            pic.top = 0
-
-        # Simpan presentasi ke buffer memori
-        output_io = BytesIO()
-        prs.save(output_io)
-        output_io.seek(0)
-
-        # Kirim file .pptx
-        return StreamingResponse(
-            output_io,
-            media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-            headers={"Content-Disposition": f"attachment; filename={os.path.splitext(file.filename)[0]}.pptx"}
+    def convert(report):
+        output_path = new_output_path(".pptx")
+        try:
+            ops.pdf_to_powerpoint(pdf_path, output_path, report)
+        except Exception:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+        finally:
+            if is_temp:
+                cleanup_file(pdf_path)
+        return (
+            output_path,
+            f"{os.path.splitext(filename)[0]}.pptx",
+            "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+            {}
         )
 
-    except Exception as e:
-        raise HTTPException(500, f"Terjadi error saat konversi ke PPTX: {e}. Pastikan Poppler terinstal.")
+    return await conversion_response(
+        convert, progress, "Terjadi error saat konversi ke PPTX: {e}. Pastikan Poppler terinstal."
+    )
 
 
 @app.post("/to-excel", summary="Konversi tabel PDF ke Excel (termasuk gambar)")
 async def pdf_to_excel(
-    file: UploadFile = File(..., description="File PDF yang akan dikonversi."),
-    flavor: str = Form("lattice", description="Metode ekstraksi: 'lattice' (untuk tabel bergaris) atau 'stream' (tanpa garis).")
+    file: UploadFile = File(None, description="File PDF yang akan dikonversi."),
+    flavor: str = Form("lattice", description="Metode ekstraksi: 'lattice' (untuk tabel bergaris) atau 'stream' (tanpa garis)."),
+    doc_id: str = Form(None, description="doc_id dokumen tersimpan (pengganti 'file')"),
+    progress: bool = Form(False, description="Kirim progres per halaman sebagai Server-Sent Events; event terakhir berisi link download."),
 ):
     """
     Mengekstrak tabel dari PDF dan menyimpannya sebagai file Excel.
@@ -473,223 +1036,150 @@ async def pdf_to_excel(
     
     MEMBUTUHKAN GHOSTSCRIPT terinstal di server.
     """
-    if file.content_type != "application/pdf":
-        raise HTTPException(400, "Hanya file PDF yang diizinkan.")
+    check_pdf_input(file, doc_id)
     if flavor not in ['lattice', 'stream']:
         raise HTTPException(400, "Flavor harus 'lattice' atau 'stream'.")
 
-    temp_pdf_path = None
-    output_path = None
-    pdf_doc = None
-    
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
-            content = await file.read()
-            temp_pdf.write(content)
-            temp_pdf_path = temp_pdf.name
-        
-        output_path = tempfile.mktemp(suffix=".xlsx") 
-        
-        print("\n--- [DEBUG] Memulai Ekstraksi Camelot ---")
-        tables = camelot.read_pdf(temp_pdf_path, pages='all', flavor=flavor)
-        print(f"--- [DEBUG] Camelot Selesai. Ditemukan {tables.n} tabel. ---")
-
-        if tables.n == 0:
-            raise HTTPException(404, "Tidak ada tabel yang ditemukan di PDF ini.")
-
-        pdf_doc = fitz.open(temp_pdf_path) 
-        print("--- [DEBUG] PyMuPDF (fitz) berhasil membuka PDF. ---")
-
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            for i, table in enumerate(tables):
-                sheet_name = f'Tabel {i+1}'
-                table.df.to_excel(
-                    writer, 
-                    sheet_name=sheet_name, 
-                    header=False, 
-                    index=False
-                )
-                
-                ws = writer.sheets[sheet_name]
-                page_num = table.page - 1 
-                page = pdf_doc.load_page(page_num) 
-                
-                page_height = page.rect.height
-                
-                print(f"\n--- [DEBUG] Memproses Tabel {i+1} di Halaman PDF {page_num+1} (Tinggi: {page_height}pt) ---")
-                
-                images_on_page = page.get_images(full=True)
-                print(f"--- [DEBUG] Ditemukan {len(images_on_page)} gambar di halaman ini. ---")
-
-                # [BARU] Set untuk melacak xref gambar yang sudah digunakan
-                used_image_xrefs = set()
-
-                for r_idx in range(len(table.rows)):
-                    for c_idx in range(len(table.cols)):
-                        cell_text = table.df.iloc[r_idx, c_idx]
-                        if not cell_text: # Hanya proses sel yang kosong
-                            cell_coords = table.cells[r_idx][c_idx]
-                            
-                            new_y1 = page_height - cell_coords.y2
-                            new_y2 = page_height - cell_coords.y1
-                            
-                            cell_bbox = fitz.Rect(cell_coords.x1, new_y1, cell_coords.x2, new_y2)
-                            
-                            print(f"\n[DEBUG] Memeriksa Sel Kosong [{r_idx},{c_idx}]")
-                            print(f"  > Koord. Asli (Camelot, Bawah): ({cell_coords.x1}, {cell_coords.y1}, {cell_coords.x2}, {cell_coords.y2})")
-                            print(f"  > Koord. Baru (PyMuPDF, Atas): {cell_bbox}")
-                            
-                            # [BARU] Flag untuk menandai apakah gambar sudah ditemukan untuk sel ini
-                            image_found_for_cell = False
-
-                            for img_info in images_on_page:
-                                xref = img_info[0]
-                                
-                                # [BARU] Lewati gambar jika sudah digunakan
-                                if xref in used_image_xrefs:
-                                    print(f"  > Gambar (xref:{xref}) sudah digunakan. Lewati.")
-                                    continue
-                                
-                                rects = page.get_image_rects(xref)
-                                for r in rects:
-                                    img_bbox = fitz.Rect(r)
-                                    print(f"  > Membandingkan dengan Gbr (xref:{xref}) di Koordinat: {img_bbox}")
-                                    
-                                    if cell_bbox.intersects(img_bbox):
-                                        print(f"  [BERHASIL!] Gambar BERSINGGUNGAN dengan sel. Mencoba menyisipkan...")
-                                        
-                                        base_image = pdf_doc.extract_image(xref)
-                                        image_bytes = base_image["image"]
-                                        
-                                        try:
-                                            img_data = BytesIO(image_bytes)
-                                            excel_img = OpenPyXLImage(img_data)
-                                            cell_id = f"{get_column_letter(c_idx + 1)}{r_idx + 1}"
-                                            
-                                            ws.row_dimensions[r_idx + 1].height = 70
-                                            ws.column_dimensions[get_column_letter(c_idx + 1)].width = 15
-                                            excel_img.height = 80
-                                            excel_img.width = 80
-                                            
-                                            ws.add_image(excel_img, cell_id)
-                                            print(f"  [SUKSES] Gambar disisipkan ke sel {cell_id}")
-                                            
-                                            used_image_xrefs.add(xref) # [BARU] Tandai gambar ini sudah digunakan
-                                            image_found_for_cell = True # [BARU] Set flag
-                                            break # Keluar dari loop 'r in rects'
-                                        except Exception as e:
-                                            print(f"  [ERROR SISPKA] Gagal memuat/menyisipkan gambar: {e}")
-                                    else:
-                                        print(f"  [INFO] Gambar tidak bersinggungan.")
-                                
-                                if image_found_for_cell: # [BARU] Jika sudah ketemu gambar untuk sel ini
-                                    break # Keluar dari loop 'img_info in images_on_page'
-                            # Akhir loop gambar
-                    # Akhir loop kolom
-                # Akhir loop baris
-            # Akhir loop tabel
-        
-        print("\n--- [DEBUG] Menutup dokumen PDF. ---")
-        pdf_doc.close()
-        pdf_doc = None 
-        
-        os.remove(temp_pdf_path) 
-        print("--- [DEBUG] File PDF sementara dihapus. ---")
-
-        return FileResponse(
-            path=output_path,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            filename=f"{os.path.splitext(file.filename)[0]}.xlsx",
-            background=BackgroundTask(cleanup_file, path=output_path)
+    temp_pdf_path, filename, is_temp = await pdf_input_path(file, doc_id)
+
+    def convert(report):
+        output_path = new_output_path(".xlsx")
+        try:
+            ops.pdf_to_excel(temp_pdf_path, output_path, flavor, report)
+        except Exception as e:
+            print(f"\n--- [DEBUG] Terjadi ERROR Global ---")
+            print(str(e))
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+        finally:
+            if is_temp:
+                os.remove(temp_pdf_path)
+                print("--- [DEBUG] File PDF sementara dihapus. ---")
+        return (
+            output_path,
+            f"{os.path.splitext(filename)[0]}.xlsx",
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            {}
         )
 
+    return await conversion_response(
+        convert, progress, "Terjadi error saat konversi ke Excel (dengan gambar): {e}. Pastikan Ghostscript terinstal."
+    )
+
+@app.post("/compress", summary="Kompres / perkecil ukuran PDF")
+async def compress_pdf(
+    file: UploadFile = File(None, description="File PDF yang akan dikompres."),
+    level: str = Form("medium", description="'low' (lossless), 'medium' (gambar 150 dpi), atau 'high' (gambar 96 dpi, kualitas lebih rendah)."),
+    doc_id: str = Form(None, description="doc_id dokumen tersimpan (pengganti 'file')")
+):
+    """
+    Memperkecil PDF dengan menghapus objek duplikat/tak terpakai, mengompres ulang
+    stream, mengemas objek ke object stream, dan (level medium/high) menurunkan
+    resolusi serta kualitas gambar.
+    """
+    check_optimize_level(level)
+    if level == "none":
+        raise HTTPException(400, "Level kompresi harus 'low', 'medium', atau 'high'.")
+    pdf_path, filename, is_temp = await pdf_input_path(file, doc_id)
+    output_path = new_output_path(".pdf")
+    try:
+        # Jika tidak ada penghematan, file asli yang dikirim
+        ops.compress_pdf(pdf_path, output_path, level)
+        response = output_response(output_path, f"compressed_{filename}", "application/pdf")
+        response.headers["X-Original-Size"] = str(os.path.getsize(pdf_path))
+        return response
+    except PdfOperationError as e:
+        cleanup_output(os.path.basename(output_path))
+        raise HTTPException(e.status_code, str(e))
     except Exception as e:
-        print(f"\n--- [DEBUG] Terjadi ERROR Global ---")
-        print(str(e))
-        if pdf_doc:
-            pdf_doc.close()
-        if temp_pdf_path and os.path.exists(temp_pdf_path):
-            os.remove(temp_pdf_path)
-        if output_path and os.path.exists(output_path):
-            os.remove(output_path)
-        
-        if isinstance(e, HTTPException):
-            raise e
-        
-        raise HTTPException(500, f"Terjadi error saat konversi ke Excel (dengan gambar): {e}. Pastikan Ghostscript terinstal.")
+        cleanup_output(os.path.basename(output_path))
+        raise HTTPException(500, f"Terjadi error saat mengompres PDF: {e}")
+    finally:
+        if is_temp:
+            cleanup_file(pdf_path)
+
 
 @app.post("/delete-pages", summary="Hapus halaman PDF berdasarkan rentang")
 async def delete_pages(
-    file: UploadFile = File(..., description="File PDF yang akan diproses."),
-    page_range: str = Form(..., description="Halaman yang akan dihapus (cth: '2-5' atau '1, 3')")
+    file: UploadFile = File(None, description="File PDF yang akan diproses."),
+    page_range: str = Form(..., description="Halaman yang akan dihapus (cth: '2-5' atau '1, 3')"),
+    doc_id: str = Form(None, description="doc_id dokumen tersimpan (pengganti 'file')"),
+    optimize: str = Form("none", description="Optimasi ukuran output: 'none', 'low', 'medium', 'high' (lihat /compress).")
 ):
     """
     Menghapus halaman berdasarkan rentang (cth: '1, 3, 5-7')
     dan mengembalikan PDF dengan sisa halaman.
     """
-    if file.content_type != "application/pdf":
-        raise HTTPException(400, "Hanya file PDF yang diizinkan.")
+    check_optimize_level(optimize)
+    reader, filename = await open_pdf_input(file, doc_id)
 
     try:
-        pdf_bytes = await file.read()
-        reader = PdfReader(BytesIO(pdf_bytes))
-
-        if reader.is_encrypted:
-            raise HTTPException(400, "File PDF terenkripsi. Buka sandi terlebih dahulu.")
-        
-        total_pages = len(reader.pages)
-        
-        # Gunakan helper yang sama dengan '/split'
-        # untuk mendapatkan set halaman (0-indexed) yang akan DIHAPUS
-        indices_to_delete = parse_page_range(page_range, total_pages)
-        
-        writer = PdfWriter()
-
-        # Loop semua halaman, tambahkan HANYA jika TIDAK ADA di set hapus
-        for i in range(total_pages):
-            if i not in indices_to_delete:
-                writer.add_page(reader.pages[i])
+        # Halaman yang dihapus adalah kebalikan dari halaman yang diekstrak '/split'
+        _, writer = ops.split_pdf(reader, page_range)
         
         if len(writer.pages) == 0:
             raise HTTPException(400, "Tidak ada halaman tersisa setelah penghapusan.")
 
-        # Simpan ke memori
-        output_io = BytesIO()
-        writer.write(output_io)
-        output_io.seek(0)
-        
-        return StreamingResponse(
-            output_io,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=deleted_{file.filename}"}
-        )
+        return pdf_output_response(writer, f"deleted_{filename}", optimize)
     except HTTPException as e:
         raise e
+    except PdfOperationError as e:
+        raise HTTPException(e.status_code, str(e))
     except Exception as e:
         raise HTTPException(500, f"Terjadi error saat menghapus halaman: {e}")
 
 
+def json_int(value) -> int:
+    """Angka bulat dari JSON; true/false dan pecahan (cth: 1.9) ditolak, bukan dibulatkan."""
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{value!r} bukan bilangan bulat")
+    return value
+
+
 @app.post("/arrange-pages", summary="Atur ulang urutan dan rotasi halaman PDF")
 async def arrange_pages(
-    file: UploadFile = File(..., description="File PDF yang akan diatur."),
-    new_order: str = Form(..., description="Urutan halaman baru, dipisah koma (cth: '3,1,2,4')"),
-    rotations: str = Form("{}", description="JSON string rotasi per halaman (cth: '{\"1\": 90, \"2\": 180}')")
+    file: UploadFile = File(None, description="File PDF yang akan diatur."),
+    new_order: str = Form(None, description="Urutan halaman baru, dipisah koma (cth: '3,1,2,4'). Untuk satu file; abaikan jika memakai 'order'."),
+    rotations: str = Form("{}", description="JSON string rotasi per halaman (cth: '{\"1\": 90, \"2\": 180}')"),
+    files: List[UploadFile] = File(None, description="File PDF sumber tambahan untuk 'order'."),
+    doc_ids: str = Form(None, description="doc_id dokumen tersimpan tambahan untuk 'order', dipisah koma."),
+    order: str = Form(None, description="JSON list halaman dari beberapa sumber (cth: '[{\"file\": 0, \"page\": 2, \"rotation\": 90}, {\"file\": 1, \"page\": 1}]')."),
+    doc_id: str = Form(None, description="doc_id dokumen tersimpan (pengganti 'file')"),
+    optimize: str = Form("none", description="Optimasi ukuran output: 'none', 'low', 'medium', 'high' (lihat /compress).")
 ):
     """
     Mengatur ulang halaman PDF dan merotasinya berdasarkan urutan dan data rotasi yang diberikan.
+
+    Dengan 'order', halaman bisa diambil dari beberapa PDF sekaligus, dipakai berulang,
+    atau dilewati; hasilnya ditulis sekali. 'file' pada tiap entri adalah indeks sumber
+    (mulai 0) dengan urutan: upload ('file', lalu 'files'), kemudian dokumen tersimpan
+    ('doc_id', lalu 'doc_ids'). 'page' mulai dari 1; 'rotation' opsional.
     """
-    if file.content_type != "application/pdf":
-        raise HTTPException(400, "Hanya file PDF yang diizinkan.")
+    check_optimize_level(optimize)
 
-    try:
-        pdf_bytes = await file.read()
-        reader = PdfReader(BytesIO(pdf_bytes))
+    sources = [(f, None) for f in ([file] if file else []) + (files or [])]
+    sources += [(None, d.strip()) for d in [doc_id or ""] + (doc_ids or "").split(",") if d.strip()]
+    if not sources:
+        raise HTTPException(400, "Kirim 'file' PDF atau 'doc_id' dari /documents.")
+
+    if order is not None:
+        try:
+            entries = json.loads(order)
+            if not isinstance(entries, list):
+                raise ValueError
+            page_order = [
+                (json_int(entry["file"]), json_int(entry["page"]) - 1, json_int(entry.get("rotation", 0)))
+                for entry in entries
+            ]
+        except (ValueError, TypeError, KeyError, AttributeError):
+            raise HTTPException(400, "Format 'order' tidak valid. Gunakan JSON list berisi {\"file\", \"page\", \"rotation\"}.")
+    else:
+        if new_order is None:
+            raise HTTPException(400, "Kirim 'new_order' (satu file) atau 'order'.")
+        if len(sources) != 1:
+            raise HTTPException(400, "'new_order' hanya untuk satu file. Gunakan 'order' untuk beberapa file.")
 
-        if reader.is_encrypted:
-            raise HTTPException(400, "File PDF terenkripsi. Buka sandi terlebih dahulu.")
-        
-        total_pages = len(reader.pages)
-        
         # Parsing input 'new_order'
         try:
             # Ubah string "3,1,2,4" -> list [2, 0, 1, 3] (0-indexed)
@@ -698,12 +1188,28 @@ async def arrange_pages(
             raise HTTPException(400, "Format 'new_order' tidak valid. Gunakan angka dipisah koma.")
 
         # Parsing input 'rotations'
+        # Kunci di rotation_map adalah nomor halaman ASLI (string "1", "2", dst.)
         try:
             rotation_map = json.loads(rotations)
-        except json.JSONDecodeError:
-            raise HTTPException(400, "Format 'rotations' tidak valid. Harus berupa JSON string.")
-
-        # Validasi
+            if not isinstance(rotation_map, dict):
+                raise ValueError
+            rotation_map = {str(page): int(angle) for page, angle in rotation_map.items()}
+        except (ValueError, TypeError, OverflowError):
+            raise HTTPException(400, "Format 'rotations' tidak valid. Gunakan JSON object {\"nomor_halaman\": sudut}.")
+
+        page_order = [(0, i, rotation_map.get(str(i + 1), 0)) for i in order_indices]
+
+    readers, names = [], []
+    for f, d in sources:
+        reader, filename = await open_pdf_input(f, d)
+        readers.append(reader)
+        names.append(filename)
+
+    if order is None:
+        # Mode lama: harus permutasi lengkap dari halaman file
+        if readers[0].is_encrypted:
+            raise HTTPException(400, "File PDF terenkripsi. Buka sandi terlebih dahulu.")
+        total_pages = len(readers[0].pages)
         if len(order_indices) != total_pages:
             raise HTTPException(400, f"Jumlah halaman di 'new_order' ({len(order_indices)}) tidak cocok dengan total halaman PDF ({total_pages}).")
         if not all(0 <= i < total_pages for i in order_indices):
@@ -711,61 +1217,38 @@ async def arrange_pages(
         if len(set(order_indices)) != total_pages:
             raise HTTPException(400, "Urutan halaman tidak boleh ada duplikat.")
 
-        writer = PdfWriter()
-        
-        # Buat daftar halaman asli
-        original_pages = list(reader.pages)
-
-        # Tambahkan halaman sesuai urutan baru dan rotasi
-        for original_page_index in order_indices:
-            page = original_pages[original_page_index]
-            
-            # Dapatkan rotasi untuk halaman ASLI (1-indexed)
-            # Kunci di rotation_map adalah string "1", "2", dst.
-            rotation_angle = rotation_map.get(str(original_page_index + 1), 0)
-            
-            if rotation_angle != 0:
-                page.rotate(rotation_angle)
-            
-            writer.add_page(page)
-
-        output_io = BytesIO()
-        writer.write(output_io)
-        output_io.seek(0)
-        
-        return StreamingResponse(
-            output_io,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=arranged_{file.filename}"}
-        )
-    except HTTPException as e:
-        raise e
+    try:
+        writer = ops.assemble_pages(readers, page_order, names)
+        output_name = f"arranged_{names[0]}" if len(sources) == 1 else "arranged.pdf"
+        return pdf_output_response(writer, output_name, optimize)
+    except PdfOperationError as e:
+        raise HTTPException(e.status_code, str(e))
     except Exception as e:
         raise HTTPException(500, f"Terjadi error saat mengatur halaman: {e}")
 
 
 @app.post("/add-signature", summary="Tambahkan gambar tanda tangan ke PDF")
 async def add_signature(
-    file: UploadFile = File(..., description="File PDF utama."),
+    file: UploadFile = File(None, description="File PDF utama."),
     signature_image: UploadFile = File(..., description="File gambar .png tanda tangan."),
     page_number: int = Form(1, description="Nomor halaman (1-indexed) untuk tanda tangan."),
     x_pos: int = Form(50, description="Posisi X (dari kiri) dalam poin (pt)."),
     y_pos: int = Form(50, description="Posisi Y (dari BAWAH) dalam poin (pt)."),
-    width: int = Form(150, description="Lebar gambar tanda tangan dalam poin (pt).")
+    width: int = Form(150, description="Lebar gambar tanda tangan dalam poin (pt)."),
+    doc_id: str = Form(None, description="doc_id dokumen tersimpan (pengganti 'file')"),
+    optimize: str = Form("none", description="Optimasi ukuran output: 'none', 'low', 'medium', 'high' (lihat /compress).")
 ):
     """
     Menambahkan gambar (seperti tanda tangan) ke halaman PDF
     pada koordinat yang ditentukan.
     CATATAN: (0, 0) adalah pojok KIRI BAWAH.
     """
-    if file.content_type != "application/pdf":
-        raise HTTPException(400, "Hanya file PDF yang diizinkan.")
+    check_optimize_level(optimize)
     if signature_image.content_type not in ["image/png", "image/jpeg"]:
         raise HTTPException(400, "File tanda tangan harus .png atau .jpg.")
+    reader, filename = await open_pdf_input(file, doc_id)
 
     try:
-        pdf_bytes = await file.read()
-        reader = PdfReader(BytesIO(pdf_bytes))
 
         if reader.is_encrypted:
             raise HTTPException(400, "File PDF terenkripsi. Buka sandi terlebih dahulu.")
@@ -817,24 +1300,14 @@ async def add_signature(
         # 4. Gabungkan stempel dengan halaman PDF asli
         writer = PdfWriter()
         for i in range(len(reader.pages)):
-            page = reader.pages[i]
+            new_page = writer.add_page(reader.pages[i])
             
             # Jika ini halaman target, gabungkan (overlay) dengan stempel
             if i == page_index:
-                page.merge_page(stamp_page)
-            
-            writer.add_page(page)
+                new_page.merge_page(stamp_page)
         # --- [LOGIKA BARU SELESAI] ---
 
-        output_io = BytesIO()
-        writer.write(output_io)
-        output_io.seek(0)
-        
-        return StreamingResponse(
-            output_io,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=signed_{file.filename}"}
-        )
+        return pdf_output_response(writer, f"signed_{filename}", optimize)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -844,70 +1317,460 @@ async def add_signature(
 async def scan_images(
     files: List[UploadFile] = File(..., description="Images to be scanned (max 20)."),
     effect: str = Form("scan", description="Scanner effect: 'scan', 'magic_color', 'original'."),
-    output_format: str = Form("pdf", description="Output format: 'pdf' or 'jpg'.")
+    output_format: str = Form("pdf", description="Output format: 'pdf' or 'jpg'."),
+    optimize: str = Form("none", description="Output size optimization for 'pdf': 'none', 'low', 'medium', 'high'.")
 ):
     if len(files) > 20:
         raise HTTPException(400, "Cannot process more than 20 images at a time.")
-    if effect not in ['scan', 'magic_color', 'original']:
+    if effect not in ops.SCAN_EFFECTS:
         raise HTTPException(400, "Invalid effect. Choose 'scan', 'magic_color', or 'original'.")
     if output_format not in ['pdf', 'jpg']:
         raise HTTPException(400, "Invalid output format. Choose 'pdf' or 'jpg'.")
+    check_optimize_level(optimize)
 
-    processed_images = []
     for file in files:
         if not file.content_type.startswith("image/"):
             raise HTTPException(400, f"File {file.filename} is not a valid image.")
-        
-        image_bytes = await file.read()
-        img = Image.open(BytesIO(image_bytes)).convert("RGB")
-
-        if effect == 'scan':
-            # Grayscale and high contrast
-            img = img.convert('L')
-            img = img.point(lambda x: 0 if x < 140 else 255, '1')
-            img = img.convert('RGB') # Convert back to RGB for consistent processing
-        elif effect == 'magic_color':
-            # Enhance contrast and brightness
-            from PIL import ImageEnhance
-            enhancer = ImageEnhance.Contrast(img)
-            img = enhancer.enhance(1.8) # Increase contrast
-            enhancer = ImageEnhance.Brightness(img)
-            img = enhancer.enhance(1.1) # Slightly increase brightness
-
-        processed_images.append(img)
-
-    if output_format == 'pdf':
-        output_io = BytesIO()
-        if processed_images:
-            processed_images[0].save(
-                output_io, 
-                format="PDF", 
-                resolution=100.0, 
-                save_all=True, 
-                append_images=processed_images[1:]
-            )
-        output_io.seek(0)
-        return StreamingResponse(
-            output_io,
-            media_type="application/pdf",
-            headers={"Content-Disposition": "attachment; filename=scanned_document.pdf"}
-        )
-    
-    elif output_format == 'jpg':
-        zip_io = BytesIO()
-        with zipfile.ZipFile(zip_io, 'w') as zf:
-            for i, img in enumerate(processed_images):
-                img_io = BytesIO()
-                img.save(img_io, format='JPEG')
-                img_io.seek(0)
-                zf.writestr(f"scanned_page_{i+1}.jpg", img_io.getvalue())
-        zip_io.seek(0)
-        return StreamingResponse(
-            zip_io,
-            media_type="application/zip",
-            headers={"Content-Disposition": "attachment; filename=scanned_images.zip"}
-        )
-        
+
+    output_path = new_output_path(".pdf" if output_format == 'pdf' else ".zip")
+    try:
+        ops.scan_images([file.file for file in files], output_path, effect, output_format)
+        if output_format == 'pdf':
+            optimize_pdf_file(output_path, optimize)
+            return output_response(output_path, "scanned_document.pdf", "application/pdf")
+        return output_response(output_path, "scanned_images.zip", "application/zip")
+    except PdfOperationError as e:
+        cleanup_output(os.path.basename(output_path))
+        raise HTTPException(e.status_code, str(e))
+
+
+# --- Document Store ---
+@app.post("/documents", summary="Upload PDF sekali untuk dipakai di banyak operasi")
+async def upload_document(file: UploadFile = File(..., description="File PDF yang akan disimpan.")):
+    """
+    Menyimpan PDF di server dan mengembalikan 'doc_id'.
+    Kirim 'doc_id' (form field) ke endpoint lain sebagai ganti 'file'.
+    Dokumen dihapus otomatis setelah tidak dipakai selama DOC_STORE_TTL detik.
+    """
+    if file.content_type != "application/pdf":
+        raise HTTPException(400, "Hanya file PDF yang diizinkan.")
+    pdf_bytes = await file.read()
+    doc_id = store_document(pdf_bytes, file.filename)
+    try:
+        return document_summary(doc_id)
+    except Exception as e:
+        delete_document(doc_id)
+        raise HTTPException(400, f"Error membaca {file.filename}: {e}")
+
+
+@app.get("/documents/{doc_id}", summary="Info dokumen tersimpan")
+async def read_document(doc_id: str):
+    return document_summary(doc_id)
+
+
+@app.delete("/documents/{doc_id}", summary="Hapus dokumen tersimpan")
+async def remove_document(doc_id: str):
+    get_document_path(doc_id)
+    delete_document(doc_id)
+    return {"doc_id": doc_id, "deleted": True}
+
+
+# --- Output File ---
+@app.get("/outputs/{output_id}", summary="Download ulang / lanjutkan download hasil operasi")
+async def read_output(output_id: str):
+    """
+    Mengirim file hasil yang masih tersimpan (lihat header Content-Location
+    pada respons operasi). Mendukung header Range untuk melanjutkan download.
+    """
+    output_id = os.path.basename(output_id)
+    path = os.path.join(OUTPUT_DIR, output_id)
+    # Hanya file yang sudah terdaftar (punya metadata .json) yang bisa diambil;
+    # file sementara atau hasil yang belum selesai ditulis dianggap tidak ada.
+    meta = None
+    if not output_id.endswith(".json") and os.path.isfile(path):
+        try:
+            with open(path + ".json") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            pass
+    if meta is None:
+        raise HTTPException(404, "File hasil tidak ditemukan atau sudah kedaluwarsa.")
+    background = None
+    if OUTPUT_TTL <= 0:
+        background = BackgroundTask(cleanup_output, output_id=output_id)
+    return FileResponse(path=path, media_type=meta["media_type"], filename=meta["filename"], background=background)
+
+
+# --- Chunked Upload ---
+@app.post("/uploads", summary="Mulai upload PDF besar per potongan (chunk)")
+async def create_upload(
+    filename: str = Form(..., description="Nama file PDF."),
+    size: int = Form(..., description="Ukuran total file dalam byte."),
+    chunk_size: int = Form(8 * 1024 * 1024, description="Ukuran setiap chunk dalam byte (chunk terakhir boleh lebih kecil).")
+):
+    """
+    Alur upload:
+    1. POST /uploads -> upload_id dan jumlah chunk.
+    2. PUT /uploads/{upload_id}/chunks/{index} untuk setiap chunk (boleh paralel / tidak berurutan),
+       dengan header 'X-Chunk-SHA256' berisi hash SHA-256 isi chunk.
+    3. GET /uploads/{upload_id} untuk melihat chunk yang belum diterima (resume).
+    4. POST /uploads/{upload_id}/complete (opsional dengan 'sha256' seluruh file)
+       -> doc_id yang bisa dipakai di semua endpoint.
+    """
+    if not 0 < size <= UPLOAD_MAX_SIZE:
+        raise HTTPException(400, f"Ukuran file harus antara 1 dan {UPLOAD_MAX_SIZE} byte.")
+    if not UPLOAD_MIN_CHUNK_SIZE <= chunk_size <= UPLOAD_MAX_CHUNK_SIZE:
+        raise HTTPException(400, f"chunk_size harus antara {UPLOAD_MIN_CHUNK_SIZE} dan {UPLOAD_MAX_CHUNK_SIZE} byte.")
+    purge_expired_uploads()
+
+    upload_id = uuid.uuid4().hex
+    path = _upload_dir(upload_id)
+    os.makedirs(os.path.join(path, "chunks"))
+    # Alokasikan file sekali agar setiap chunk bisa langsung ditulis di offset-nya
+    with open(os.path.join(path, "data.pdf"), "wb") as f:
+        f.truncate(size)
+    chunk_count = -(-size // chunk_size)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"filename": filename, "size": size, "chunk_size": chunk_size, "chunk_count": chunk_count}, f)
+    return {"upload_id": upload_id, "chunk_size": chunk_size, "chunk_count": chunk_count}
+
+
+@app.get("/uploads/{upload_id}", summary="Status upload (untuk resume)")
+async def read_upload(upload_id: str):
+    meta = get_upload_meta(upload_id)
+    received = received_chunks(upload_id)
+    missing = sorted(set(range(meta["chunk_count"])) - set(received))
+    return {"upload_id": upload_id, **meta, "received": received, "missing": missing}
+
+
+@app.put("/uploads/{upload_id}/chunks/{index}", summary="Kirim satu chunk")
+async def upload_chunk(upload_id: str, index: int, request: Request):
+    meta = get_upload_meta(upload_id)
+    if not 0 <= index < meta["chunk_count"]:
+        raise HTTPException(400, "Nomor chunk tidak valid.")
+    expected_sha = request.headers.get("x-chunk-sha256", "").lower()
+    if not expected_sha:
+        raise HTTPException(400, "Header 'X-Chunk-SHA256' wajib diisi.")
+
+    path = _upload_dir(upload_id)
+    offset = index * meta["chunk_size"]
+    expected_len = min(meta["chunk_size"], meta["size"] - offset)
+    # Chunk yang dikirim ulang dianggap belum diterima sampai isinya terverifikasi,
+    # dan isinya ditampung di file sementara dulu supaya data.pdf hanya pernah
+    # berisi chunk yang checksum-nya cocok.
+    marker = os.path.join(path, "chunks", str(index))
+    try:
+        os.remove(marker)
+    except FileNotFoundError:
+        pass
+    part_path = os.path.join(path, f"chunk-{index}-{uuid.uuid4().hex}.part")
+    sha = hashlib.sha256()
+    written = 0
+    try:
+        with open(part_path, "wb") as part:
+            async for block in request.stream():
+                if written + len(block) > expected_len:
+                    raise HTTPException(400, f"Chunk {index} lebih besar dari {expected_len} byte.")
+                part.write(block)
+                sha.update(block)
+                written += len(block)
+
+        if written != expected_len:
+            raise HTTPException(400, f"Chunk {index} harus berukuran {expected_len} byte, diterima {written}.")
+        if sha.hexdigest() != expected_sha:
+            raise HTTPException(422, f"Checksum chunk {index} tidak cocok. Kirim ulang chunk ini.")
+
+        fd = os.open(os.path.join(path, "data.pdf"), os.O_WRONLY)
+        try:
+            with open(part_path, "rb") as part:
+                position = offset
+                for block in iter(lambda: part.read(1024 * 1024), b""):
+                    os.pwrite(fd, block, position)
+                    position += len(block)
+        finally:
+            os.close(fd)
+    finally:
+        cleanup_file(part_path)
+
+    open(marker, "w").close()
+    os.utime(path)
+    return {"upload_id": upload_id, "index": index, "received": len(received_chunks(upload_id)), "chunk_count": meta["chunk_count"]}
+
+
+@app.post("/uploads/{upload_id}/complete", summary="Selesaikan upload dan simpan sebagai dokumen")
+async def complete_upload(
+    upload_id: str,
+    sha256: Optional[str] = Form(None, description="Opsional: SHA-256 seluruh file untuk memastikan hasil gabungan utuh.")
+):
+    """
+    Memastikan semua chunk sudah diterima, lalu memindahkan file hasil gabungan
+    ke document store. Hasilnya sama dengan POST /documents (ada 'doc_id').
+    Jika 'sha256' diisi dan tidak cocok, upload tidak dihapus tetapi semua chunk
+    ditandai belum diterima sehingga bisa dikirim ulang.
+    """
+    meta = get_upload_meta(upload_id)
+    missing = sorted(set(range(meta["chunk_count"])) - set(received_chunks(upload_id)))
+    if missing:
+        raise HTTPException(409, f"Upload belum lengkap. Chunk yang belum diterima: {missing}")
+
+    path = _upload_dir(upload_id)
+    data_path = os.path.join(path, "data.pdf")
+    # Hash file sampai UPLOAD_MAX_SIZE dihitung di thread supaya event loop tidak tertahan
+    digest = await run_in_thread(file_sha256, data_path)
+    if sha256 and digest != sha256.strip().lower():
+        for index in received_chunks(upload_id):
+            cleanup_file(os.path.join(path, "chunks", str(index)))
+        raise HTTPException(422, "Checksum file tidak cocok. Kirim ulang semua chunk.")
+    doc_id = store_document_file(data_path, meta["filename"], digest)
+    cleanup_dir(path)
+    try:
+        return document_summary(doc_id)
+    except Exception as e:
+        delete_document(doc_id)
+        raise HTTPException(400, f"Error membaca {meta['filename']}: {e}")
+
+
+# --- Thumbnail Halaman ---
+def get_thumbnail_doc(doc_id: str) -> "fitz.Document":
+    doc = get_document_fitz(doc_id)
+    if doc.needs_pass:
+        raise HTTPException(400, "File PDF terenkripsi. Buka sandi terlebih dahulu.")
+    return doc
+
+
+@app.post("/thumbnails", summary="Daftarkan PDF untuk thumbnail halaman")
+async def create_thumbnails(file: UploadFile = File(..., description="File PDF yang akan dibuat thumbnail-nya.")):
+    """
+    Upload PDF sekali (sama seperti /documents), lalu ambil thumbnail per halaman lewat
+    GET /thumbnails/{doc_id}/{page_number} sesuai halaman yang terlihat di editor.
+    """
+    if file.content_type != "application/pdf":
+        raise HTTPException(400, "Hanya file PDF yang diizinkan.")
+    pdf_bytes = await file.read()
+    doc_id = store_document(pdf_bytes, file.filename)
+    try:
+        return {"doc_id": doc_id, "page_count": get_thumbnail_doc(doc_id).page_count}
+    except HTTPException:
+        raise
+    except Exception as e:
+        # Sama seperti /documents: file yang tidak bisa dibaca tidak disimpan
+        delete_document(doc_id)
+        raise HTTPException(400, f"Gagal membaca PDF untuk thumbnail: {e}")
+
+
+@app.get("/thumbnails/{doc_id}", summary="Daftar halaman dokumen (dengan paging)")
+async def list_thumbnails(
+    doc_id: str,
+    offset: int = Query(0, ge=0, description="Indeks halaman awal (0-indexed)."),
+    limit: int = Query(20, ge=1, le=THUMBNAIL_MAX_LIMIT, description="Jumlah halaman per permintaan."),
+    width: int = Query(150, ge=THUMBNAIL_MIN_WIDTH, le=THUMBNAIL_MAX_WIDTH, description="Lebar thumbnail dalam piksel.")
+):
+    """
+    Mengembalikan ukuran setiap halaman dan URL thumbnail-nya,
+    agar frontend bisa menyiapkan tempat sebelum gambar dimuat.
+    """
+    doc = get_thumbnail_doc(doc_id)
+    pages = []
+    for i in range(offset, min(offset + limit, doc.page_count)):
+        rect = doc.load_page(i).rect
+        pages.append({
+            "page_number": i + 1,
+            "width": width,
+            "height": round(width * rect.height / rect.width),
+            "url": f"/thumbnails/{doc_id}/{i + 1}?width={width}",
+        })
+    next_offset = offset + limit if offset + limit < doc.page_count else None
+    return {"doc_id": doc_id, "page_count": doc.page_count, "offset": offset, "next_offset": next_offset, "pages": pages}
+
+
+@app.get("/thumbnails/{doc_id}/{page_number}", summary="Ambil thumbnail satu halaman (PNG)")
+async def get_thumbnail(
+    request: Request,
+    doc_id: str,
+    page_number: int,
+    width: int = Query(150, ge=THUMBNAIL_MIN_WIDTH, le=THUMBNAIL_MAX_WIDTH, description="Lebar thumbnail dalam piksel.")
+):
+    doc = get_thumbnail_doc(doc_id)
+    if not (1 <= page_number <= doc.page_count):
+        raise HTTPException(400, "Nomor halaman tidak valid.")
+
+    # doc_id adalah hash isi file, jadi thumbnail untuk (doc_id, halaman, lebar) tidak pernah berubah
+    etag = f'"{doc_id}-{page_number}-{width}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400, immutable"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    try:
+        png_bytes = render_thumbnail(doc_id, page_number - 1, width)
+    except Exception as e:
+        raise HTTPException(500, f"Gagal membuat thumbnail: {e}")
+    return Response(content=png_bytes, media_type="image/png", headers=headers)
+
+
+# --- Batch ---
+@app.post("/batch", summary="Jalankan satu operasi untuk banyak PDF sekaligus")
+async def batch_process(
+    operation: str = Form(..., description=f"Operasi: {', '.join(BATCH_OPERATIONS)}."),
+    params: str = Form("{}", description="JSON parameter operasi (cth: '{\"text\": \"RAHASIA\"}', '{\"angle\": 90}')."),
+    files: List[UploadFile] = File(None, description="File PDF yang akan diproses."),
+    doc_ids: str = Form(None, description="doc_id dokumen tersimpan, dipisah koma.")
+):
+    """
+    Memproses semua file secara paralel dan mengirim hasilnya sebagai ZIP yang
+    di-stream: setiap hasil ditambahkan ke ZIP begitu file tersebut selesai.
+    File yang gagal tidak menggagalkan batch; statusnya dicatat di 'manifest.json'
+    yang selalu menjadi entri terakhir ZIP.
+    """
+    if operation not in BATCH_OPERATIONS:
+        raise HTTPException(400, f"Operasi harus salah satu dari: {', '.join(BATCH_OPERATIONS)}.")
+    try:
+        params_map = json.loads(params)
+    except json.JSONDecodeError:
+        raise HTTPException(400, "Format 'params' tidak valid. Harus berupa JSON string.")
+    if not isinstance(params_map, dict):
+        raise HTTPException(400, "Format 'params' tidak valid. Harus berupa objek JSON.")
+    job_params = BATCH_OPERATIONS[operation][1](params_map)
+
+    files = files or []
+    stored_ids = [d.strip() for d in (doc_ids or "").split(",") if d.strip()]
+    if not files and not stored_ids:
+        raise HTTPException(400, "Kirim 'files' PDF atau 'doc_ids' dari /documents.")
+    if len(files) + len(stored_ids) > BATCH_MAX_FILES:
+        raise HTTPException(400, f"Maksimal {BATCH_MAX_FILES} file per batch.")
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        # (nama file, path input)
+        inputs = []
+        for i, file in enumerate(files):
+            if file.content_type != "application/pdf":
+                raise HTTPException(400, f"File {file.filename} bukan PDF.")
+            src_path = os.path.join(work_dir, f"in_{i}.pdf")
+            with open(src_path, "wb") as f:
+                shutil.copyfileobj(file.file, f)
+            inputs.append((file.filename, src_path))
+        for doc_id in stored_ids:
+            inputs.append((get_document_info(doc_id)["filename"], get_document_path(doc_id)))
+    except Exception:
+        cleanup_dir(work_dir)
+        raise
+
+    async def stream_zip():
+        buffer = ZipStreamBuffer()
+        manifest = []
+        used_names = set()
+        pool = get_batch_pool()
+        solo_pool = None
+        solo_queue = [] # indeks job yang dicurigai, dijalankan satu per satu di solo_pool
+        lost = [0] * len(inputs) # berapa kali job hilang karena pool rusak
+        pending = {} # future -> (indeks job, waktu submit, pool)
+
+        def job_args(i: int):
+            filename, src_path = inputs[i]
+            return run_batch_job, operation, src_path, os.path.join(work_dir, f"out_{i}"), filename, job_params
+
+        def submit(i: int):
+            nonlocal pool
+            try:
+                future = pool.submit(*job_args(i))
+            except BrokenProcessPool:
+                # Pool rusak oleh request sebelumnya
+                reset_batch_pool(pool)
+                pool = get_batch_pool()
+                future = pool.submit(*job_args(i))
+            pending[asyncio.wrap_future(future)] = (i, time.time(), pool)
+
+        def submit_solo():
+            nonlocal solo_pool
+            if not solo_queue or any(p is solo_pool for _, _, p in pending.values()):
+                return
+            if solo_pool is None:
+                solo_pool = ProcessPoolExecutor(max_workers=1, mp_context=BATCH_MP_CONTEXT)
+            i = solo_queue.pop(0)
+            pending[asyncio.wrap_future(solo_pool.submit(*job_args(i)))] = (i, time.time(), solo_pool)
+
+        def job_lost(i: int, job_pool: ProcessPoolExecutor) -> Optional[str]:
+            """
+            Job hilang karena worker mati. Pool rusak membatalkan semua job di dalamnya,
+            jadi hanya job yang gagal saat berjalan sendirian yang dianggap penyebabnya.
+            Job yang sudah mulai (folder output-nya sudah dibuat) atau sudah terlalu sering
+            hilang dijalankan ulang sendirian; sisanya dikirim ulang ke pool baru.
+            """
+            nonlocal solo_pool
+            if job_pool is solo_pool:
+                solo_pool.shutdown(wait=False, cancel_futures=True)
+                solo_pool = None
+                return "Worker berhenti tidak normal saat memproses file ini (kemungkinan kehabisan memori atau crash)."
+            reset_batch_pool(job_pool)
+            lost[i] += 1
+            if os.path.isdir(job_args(i)[3]) or lost[i] > BATCH_MAX_RETRIES:
+                solo_queue.append(i)
+            else:
+                submit(i)
+            return None
+
+        try:
+            for i in range(len(inputs)):
+                submit(i)
+
+            with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+                while pending or solo_queue:
+                    submit_solo()
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for future in done:
+                        i, submitted, job_pool = pending.pop(future)
+                        filename = inputs[i][0]
+                        try:
+                            result = future.result()
+                        except BrokenProcessPool:
+                            error = job_lost(i, job_pool)
+                            if error is None:
+                                continue
+                            result = {"ok": False, "error": error, "seconds": round(time.time() - submitted, 3)}
+                        except Exception as e:
+                            result = {"ok": False, "error": str(e) or e.__class__.__name__, "seconds": round(time.time() - submitted, 3)}
+                        entry = {"file": filename, "status": "ok" if result["ok"] else "error", "seconds": result["seconds"]}
+                        if not result["ok"]:
+                            entry["error"] = result["error"]
+                            manifest.append(entry)
+                            continue
+                        entry["outputs"] = []
+                        for arcname, path in result["outputs"]:
+                            while arcname in used_names:
+                                root, ext = os.path.splitext(arcname)
+                                arcname = f"{root}_{len(used_names)}{ext}"
+                            used_names.add(arcname)
+                            entry["outputs"].append(arcname)
+                            size = os.path.getsize(path)
+                            with open(path, "rb") as src, zf.open(arcname, "w", force_zip64=size > 2 ** 31) as dest:
+                                for block in iter(lambda: src.read(1024 * 1024), b""):
+                                    dest.write(block)
+                                    yield buffer.pop()
+                            cleanup_file(path)
+                        manifest.append(entry)
+                    yield buffer.pop()
+
+                zf.writestr("manifest.json", json.dumps({
+                    "operation": operation,
+                    "total": len(manifest),
+                    "failed": sum(1 for e in manifest if e["status"] == "error"),
+                    "files": manifest,
+                }, indent=2))
+            yield buffer.pop()
+        finally:
+            for future in pending:
+                future.cancel()
+            if solo_pool is not None:
+                solo_pool.shutdown(wait=False, cancel_futures=True)
+            cleanup_dir(work_dir)
+
+    return StreamingResponse(
+        stream_zip(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=batch_{operation}.zip"}
+    )
+
+
 # --- Jalankan Server ---
 if __name__ == "__main__":
     uvicorn.run("convert_pdf:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,318 @@
+"""
+Pencatatan memori per request dan batas (ceiling) memori.
+
+Aktif lewat environment variable:
+    MEMORY_ACCOUNTING=1      catat puncak RSS & tracemalloc per request
+                             (header X-Memory-Peak-RSS / X-Memory-Peak-Traced, dan GET /metrics)
+    MEMORY_CEILING=<byte>    batas kenaikan memori per request (0 = tanpa batas).
+                             Request yang melewati batas saat diproses dihentikan dengan 507.
+    MEMORY_MAX_BODY=<byte>   tolak request dengan Content-Length di atas ini dengan 413
+                             (0 = tanpa batas). Terpisah dari MEMORY_CEILING karena upload
+                             besar tidak selalu dibaca ke memori (/batch, /uploads).
+
+Angka yang dicatat adalah kenaikan di atas nilai saat request dimulai. Memori
+diukur per proses, jadi jika beberapa request berjalan bersamaan angkanya ikut
+saling tercampur. Saat satu atau lebih request melewati batas, yang dihentikan
+hanya satu: request dengan kenaikan terbesar. Request berikutnya baru bisa
+dihentikan setelah request itu selesai melepas memorinya.
+
+Penghentian berlaku di dua tempat:
+- task asyncio milik request dibatalkan, jadi handler berhenti di 'await' berikutnya;
+- pekerjaan berat yang dijalankan di thread memanggil RequestMemory.check() (lewat
+  callback progress) di sela halaman, yang melempar MemoryCeilingExceeded.
+Kode sinkron yang berjalan langsung di event loop tidak bisa dihentikan di tengah
+jalan, karena itu operasi berat harus dijalankan di thread dengan pengecekan ini.
+
+tracemalloc hanya melihat alokasi Python (bukan buffer C milik fitz/PIL) dan
+memperlambat alokasi, karena itu hanya dinyalakan dengan MEMORY_ACCOUNTING=1;
+RSS membaca /proc/self/statm (Linux).
+"""
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+import tracemalloc
+from typing import Dict, Optional
+
+from fastapi.responses import JSONResponse
+
+MEMORY_ACCOUNTING = os.getenv("MEMORY_ACCOUNTING", "0") == "1"
+MEMORY_CEILING = int(os.getenv("MEMORY_CEILING", "0"))
+MEMORY_MAX_BODY = int(os.getenv("MEMORY_MAX_BODY", "0"))
+MEMORY_POLL_INTERVAL = float(os.getenv("MEMORY_POLL_INTERVAL", "0.05")) # detik
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _use_tracemalloc() -> bool:
+    # Tanpa /proc, batas hanya bisa diukur dengan tracemalloc
+    return MEMORY_ACCOUNTING or (MEMORY_CEILING > 0 and current_rss() is None)
+
+def enabled() -> bool:
+    return MEMORY_ACCOUNTING or MEMORY_CEILING > 0 or MEMORY_MAX_BODY > 0
+
+
+class MemoryCeilingExceeded(Exception):
+    """Dilempar oleh RequestMemory.check() untuk request yang melewati batas."""
+
+
+class RequestMemory:
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.task = asyncio.current_task()
+        self.rss_base = current_rss()
+        self.traced_base = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        self.rss_peak = 0
+        self.traced_peak = 0
+        self.growth = 0 # kenaikan pada sampel terakhir (bukan puncak)
+        self.exceeded = False
+        self.cancellable = True # False setelah request selesai atau 507 sudah dikirim
+        self.finished = False
+        self.threads = 0 # thread kerja yang masih berjalan (lihat track_thread)
+
+    @property
+    def peak(self) -> int:
+        return max(self.rss_peak, self.traced_peak)
+
+    def check(self):
+        """Dipanggil di sela pekerjaan berat (biasanya dari thread kerja); berhenti jika request ini sudah melewati batas."""
+        if self.exceeded:
+            raise MemoryCeilingExceeded(ceiling_detail(507))
+
+
+_current: "contextvars.ContextVar[Optional[RequestMemory]]" = contextvars.ContextVar("memory_guard_request", default=None)
+
+def current_request() -> Optional[RequestMemory]:
+    """RequestMemory milik request yang sedang berjalan (None jika middleware tidak aktif)."""
+    return _current.get()
+
+
+# --- Monitor ---
+# Satu thread daemon mengambil sampel selama ada request aktif. Puncak
+# tracemalloc diambil dari get_traced_memory()[1] lalu di-reset tiap sampel,
+# jadi lonjakan singkat di antara sampel tetap tercatat.
+
+_lock = threading.Lock()
+_active: Dict[int, RequestMemory] = {}
+_monitor: Optional[threading.Thread] = None
+
+def _sample(enforce: bool = True):
+    rss = current_rss()
+    traced_peak = None
+    if tracemalloc.is_tracing():
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+    for usage in _active.values():
+        rss_growth = traced_growth = 0
+        if rss is not None and usage.rss_base is not None:
+            rss_growth = rss - usage.rss_base
+            usage.rss_peak = max(usage.rss_peak, rss_growth)
+        if traced_peak is not None and usage.traced_base is not None:
+            traced_growth = traced_peak - usage.traced_base
+            usage.traced_peak = max(usage.traced_peak, traced_growth)
+        usage.growth = max(rss_growth, traced_growth)
+
+    if not enforce or not MEMORY_CEILING:
+        return
+    if any(usage.exceeded for usage in _active.values()):
+        return # tunggu request yang sudah dihentikan melepas memorinya
+    over = [usage for usage in _active.values() if usage.growth > MEMORY_CEILING]
+    if over:
+        largest = max(over, key=lambda usage: usage.growth)
+        largest.exceeded = True
+        largest.loop.call_soon_threadsafe(_cancel_request, largest)
+
+def _cancel_request(usage: RequestMemory):
+    # Berjalan di thread event loop, jadi tidak bisa balapan dengan finish_request
+    if usage.cancellable and usage.task is not None:
+        usage.task.cancel()
+
+def _monitor_loop():
+    global _monitor
+    while True:
+        time.sleep(MEMORY_POLL_INTERVAL)
+        with _lock:
+            if not _active:
+                _monitor = None
+                return
+            _sample()
+
+def start_request() -> RequestMemory:
+    global _monitor
+    if _use_tracemalloc() and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    with _lock:
+        usage = RequestMemory()
+        _active[id(usage)] = usage
+        if _monitor is None:
+            _monitor = threading.Thread(target=_monitor_loop, name="memory-guard", daemon=True)
+            _monitor.start()
+    return usage
+
+def update_request():
+    """Perbarui angka puncak tanpa menghentikan request apa pun (untuk header respons)."""
+    with _lock:
+        _sample(enforce=False)
+
+def finish_request(usage: RequestMemory):
+    with _lock:
+        usage.cancellable = False
+        usage.finished = True
+        if id(usage) not in _active:
+            return
+        _sample(enforce=False)
+        # Thread kerja yang masih berjalan tetap memegang memori request ini
+        if not usage.threads:
+            del _active[id(usage)]
+
+def track_thread(future: "asyncio.Future"):
+    """
+    Catat future run_in_executor milik request ini. Request tetap dianggap aktif
+    sampai thread-nya selesai, walaupun respons sudah dikirim (misalnya 507 dikirim
+    sebelum thread berhenti di pengecekan berikutnya), jadi memorinya tidak
+    dianggap milik request lain.
+    """
+    usage = current_request()
+    if usage is None:
+        return
+    with _lock:
+        usage.threads += 1
+    future.add_done_callback(lambda _: _thread_done(usage))
+
+def _thread_done(usage: RequestMemory):
+    with _lock:
+        usage.threads -= 1
+        if usage.finished and not usage.threads:
+            _active.pop(id(usage), None)
+
+
+# --- Metrics ---
+
+_metrics: Dict[str, dict] = {}
+
+def record_metrics(route: str, usage: RequestMemory):
+    entry = _metrics.setdefault(route, {
+        "requests": 0, "aborted": 0,
+        "rss_peak_max": 0, "rss_peak_total": 0,
+        "traced_peak_max": 0, "traced_peak_total": 0,
+    })
+    entry["requests"] += 1
+    entry["aborted"] += usage.exceeded
+    entry["rss_peak_max"] = max(entry["rss_peak_max"], usage.rss_peak)
+    entry["rss_peak_total"] += usage.rss_peak
+    entry["traced_peak_max"] = max(entry["traced_peak_max"], usage.traced_peak)
+    entry["traced_peak_total"] += usage.traced_peak
+
+def memory_metrics() -> dict:
+    routes = {}
+    for route, entry in sorted(_metrics.items()):
+        routes[route] = {
+            "requests": entry["requests"],
+            "aborted": entry["aborted"],
+            "rss_peak_max": entry["rss_peak_max"],
+            "rss_peak_avg": entry["rss_peak_total"] // entry["requests"],
+            "traced_peak_max": entry["traced_peak_max"],
+            "traced_peak_avg": entry["traced_peak_total"] // entry["requests"],
+        }
+    return {
+        "accounting": MEMORY_ACCOUNTING,
+        "ceiling": MEMORY_CEILING,
+        "max_body": MEMORY_MAX_BODY,
+        "rss": current_rss(),
+        "routes": routes,
+    }
+
+
+# --- Middleware ---
+
+def ceiling_detail(status_code: int) -> str:
+    if status_code == 413:
+        return f"Request terlalu besar untuk server (maksimal {MEMORY_MAX_BODY} byte)."
+    return f"Request dihentikan karena melewati batas memori server ({MEMORY_CEILING} byte)."
+
+def _ceiling_response(status_code: int) -> JSONResponse:
+    return JSONResponse({"detail": ceiling_detail(status_code)}, status_code=status_code)
+
+class MemoryGuardMiddleware:
+    """
+    Middleware ASGI murni (bukan BaseHTTPMiddleware) supaya FileResponse tetap
+    bisa memakai pathsend/Range. Jika batas terlampaui sebelum respons dimulai,
+    response apa pun dari handler (termasuk 500 dari 'except Exception') diganti
+    507; jika respons sudah berjalan, body diakhiri (stream SSE mendapat event
+    'error' dengan status_code 507).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if MEMORY_MAX_BODY and length and length.isdigit() and int(length) > MEMORY_MAX_BODY:
+            await _ceiling_response(413)(scope, receive, send)
+            return
+
+        usage = start_request()
+        token = _current.set(usage)
+        response_started = False
+        response_finished = False
+        event_stream = False
+        replaced = False
+
+        async def guarded_send(message):
+            nonlocal response_started, response_finished, event_stream, replaced
+            if message["type"] == "http.response.start":
+                response_started = True
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                event_stream = content_type.startswith(b"text/event-stream")
+                if usage.exceeded:
+                    usage.cancellable = False
+                    replaced = True
+                    await _ceiling_response(507)(scope, receive, send)
+                    return
+                if MEMORY_ACCOUNTING:
+                    update_request()
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-memory-peak-rss", str(usage.rss_peak).encode()),
+                        (b"x-memory-peak-traced", str(usage.traced_peak).encode()),
+                    ]
+            elif replaced:
+                return
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_finished = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, guarded_send)
+        except asyncio.CancelledError:
+            if not usage.exceeded:
+                raise
+            # Dibatalkan oleh monitor (_cancel_request), bukan oleh server
+            usage.cancellable = False
+            if hasattr(usage.task, "uncancel"):
+                usage.task.uncancel()
+            if not response_started:
+                await _ceiling_response(507)(scope, receive, send)
+            elif not response_finished:
+                body = b""
+                if event_stream:
+                    data = json.dumps({"status_code": 507, "detail": ceiling_detail(507)})
+                    body = f"event: error\ndata: {data}\n\n".encode()
+                await send({"type": "http.response.body", "body": body, "more_body": False})
+        finally:
+            _current.reset(token)
+            finish_request(usage)
+            route = getattr(scope.get("route"), "path", scope["path"])
+            record_metrics(route, usage)
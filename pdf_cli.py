@@ -0,0 +1,238 @@
+"""
+CLI untuk memproses banyak PDF di folder lokal tanpa lewat HTTP.
+
+Memakai operasi yang sama dengan API (pdf_operations.py). Struktur folder input
+dicerminkan di folder output. File yang output-nya sudah ada dan lebih baru dari
+input-nya dilewati, jadi menjalankan ulang perintah yang terhenti akan melanjutkan
+dari file yang belum selesai. Output ditulis ke file sementara lalu di-rename,
+sehingga proses yang terhenti tidak meninggalkan output setengah jadi.
+
+Contoh:
+    python pdf_cli.py watermark ./masuk ./keluar --text RAHASIA --workers 8
+    python pdf_cli.py to-word ./masuk ./keluar
+    python pdf_cli.py merge ./masuk ./keluar/gabungan.pdf
+    python pdf_cli.py scan ./foto ./keluar --effect magic_color
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+from multiprocessing import Pool
+from typing import List, NamedTuple
+
+import pdf_operations as ops
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+
+class Job(NamedTuple):
+    operation: str
+    inputs: List[str]
+    output: str
+    output_is_dir: bool
+    params: dict
+
+
+# --- Operasi per job ---
+# Setiap fungsi menulis hasil ke 'output' (path file atau folder sementara).
+
+def _run_page_operation(job: Job, output: str):
+    source = job.inputs[0]
+    if job.operation == "watermark":
+        writer = ops.watermark_pdf(source, job.params["text"])
+    elif job.operation == "lock":
+        writer = ops.lock_pdf(source, job.params["password"])
+    elif job.operation == "unlock":
+        writer = ops.unlock_pdf(source, job.params["password"])
+    else:
+        writer = ops.rotate_pdf(source, job.params["angle"])
+    ops.write_pdf(writer, output)
+
+def _run_split(job: Job, output: str):
+    writer_extracted, writer_remaining = ops.split_pdf(job.inputs[0], job.params["pages"])
+    if len(writer_extracted.pages) > 0:
+        ops.write_pdf(writer_extracted, os.path.join(output, "halaman_ekstrak.pdf"))
+    if len(writer_remaining.pages) > 0:
+        ops.write_pdf(writer_remaining, os.path.join(output, "halaman_sisa.pdf"))
+
+def _run_merge(job: Job, output: str):
+    ops.write_pdf(ops.merge_pdfs(job.inputs, job.inputs), output)
+
+OPERATIONS = {
+    "merge": _run_merge,
+    "split": _run_split,
+    "rotate": _run_page_operation,
+    "watermark": _run_page_operation,
+    "lock": _run_page_operation,
+    "unlock": _run_page_operation,
+    "compress": lambda job, output: ops.compress_pdf(job.inputs[0], output, job.params["level"]),
+    "to-images": lambda job, output: ops.pdf_to_images(job.inputs[0], output),
+    "to-word": lambda job, output: ops.pdf_to_word(job.inputs[0], output, job.params["mode"]),
+    "to-excel": lambda job, output: ops.pdf_to_excel(job.inputs[0], output, job.params["flavor"]),
+    "scan": lambda job, output: ops.scan_images(job.inputs, output, job.params["effect"], job.params["format"]),
+}
+
+# operasi -> (akhiran output, output berupa folder?)
+OUTPUT_KINDS = {
+    "split": ("", True),
+    "to-images": ("", True),
+    "to-word": (".docx", False),
+    "to-excel": (".xlsx", False),
+}
+
+
+def run_job(job: Job) -> dict:
+    """Dijalankan di worker process. Output ditulis ke '<output>.part' lalu di-rename."""
+    start = time.time()
+    partial = job.output + ".part"
+    try:
+        os.makedirs(os.path.dirname(job.output) or ".", exist_ok=True)
+        if os.path.isdir(partial):
+            shutil.rmtree(partial)
+        if job.output_is_dir:
+            os.makedirs(partial)
+        OPERATIONS[job.operation](job, partial)
+        if job.output_is_dir and os.path.isdir(job.output):
+            shutil.rmtree(job.output)
+        os.replace(partial, job.output)
+        return {"job": job, "ok": True, "seconds": time.time() - start}
+    except Exception as e:
+        if os.path.isdir(partial):
+            shutil.rmtree(partial, ignore_errors=True)
+        elif os.path.exists(partial):
+            os.remove(partial)
+        return {"job": job, "ok": False, "error": str(e) or e.__class__.__name__, "seconds": time.time() - start}
+
+
+# --- Mencari file & menyusun job ---
+
+def find_files(root: str, extensions) -> List[str]:
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(extensions):
+                found.append(os.path.join(dirpath, name))
+    return found
+
+def build_jobs(args, params: dict) -> List[Job]:
+    operation = args.operation
+    if operation == "merge":
+        inputs = find_files(args.input, (".pdf",))
+        return [Job(operation, inputs, args.output, False, params)] if inputs else []
+
+    if operation == "scan":
+        # Semua gambar dalam satu folder menjadi satu dokumen
+        by_dir = {}
+        for path in find_files(args.input, IMAGE_EXTENSIONS):
+            by_dir.setdefault(os.path.dirname(path), []).append(path)
+        suffix = ".pdf" if params["format"] == "pdf" else ".zip"
+        jobs = []
+        for dirpath, images in by_dir.items():
+            rel = os.path.relpath(dirpath, args.input)
+            name = os.path.basename(os.path.abspath(args.input)) if rel == "." else rel
+            jobs.append(Job(operation, images, os.path.join(args.output, name + suffix), False, params))
+        return jobs
+
+    suffix, output_is_dir = OUTPUT_KINDS.get(operation, (None, False))
+    jobs = []
+    for path in find_files(args.input, (".pdf",)):
+        rel = os.path.relpath(path, args.input)
+        if suffix is None:
+            output = os.path.join(args.output, rel)
+        else:
+            output = os.path.join(args.output, os.path.splitext(rel)[0] + suffix)
+        jobs.append(Job(operation, [path], output, output_is_dir, params))
+    return jobs
+
+def is_up_to_date(job: Job) -> bool:
+    """Output dianggap selesai jika ada dan lebih baru dari semua input-nya."""
+    try:
+        output_mtime = os.path.getmtime(job.output)
+    except OSError:
+        return False
+    return all(os.path.getmtime(path) <= output_mtime for path in job.inputs)
+
+
+# --- Main ---
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Proses banyak PDF di folder lokal dengan operasi BigPDF.")
+    parser.add_argument("operation", choices=sorted(OPERATIONS), help="Operasi yang dijalankan.")
+    parser.add_argument("input", help="Folder input (dicari rekursif).")
+    parser.add_argument("output", help="Folder output (untuk 'merge': path file PDF hasil).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Jumlah proses paralel.")
+    parser.add_argument("--force", action="store_true", help="Proses ulang walaupun output sudah lebih baru dari input.")
+    parser.add_argument("--text", help="Teks watermark (watermark).")
+    parser.add_argument("--password", help="Sandi PDF (lock, unlock).")
+    parser.add_argument("--angle", type=int, choices=[90, 180, 270], help="Sudut rotasi (rotate).")
+    parser.add_argument("--pages", help="Rentang halaman yang diekstrak, cth: '1, 3, 5-7' (split).")
+    parser.add_argument("--level", default="medium", choices=["low", "medium", "high"], help="Level kompresi (compress).")
+    parser.add_argument("--flavor", default="lattice", choices=["lattice", "stream"], help="Metode ekstraksi tabel (to-excel).")
+    parser.add_argument("--mode", default="layout", choices=ops.WORD_MODES, help="Mode konversi Word (to-word).")
+    parser.add_argument("--effect", default="scan", choices=ops.SCAN_EFFECTS, help="Efek scanner (scan).")
+    parser.add_argument("--format", default="pdf", choices=["pdf", "jpg"], help="Format output (scan).")
+    args = parser.parse_args(argv)
+
+    required = {"watermark": "text", "lock": "password", "unlock": "password", "rotate": "angle", "split": "pages"}
+    option = required.get(args.operation)
+    if option and getattr(args, option) is None:
+        parser.error(f"operasi '{args.operation}' membutuhkan --{option}")
+    return args
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    params = {
+        "text": args.text,
+        "password": args.password,
+        "angle": args.angle,
+        "pages": args.pages,
+        "level": args.level,
+        "flavor": args.flavor,
+        "mode": args.mode,
+        "effect": args.effect,
+        "format": args.format,
+    }
+    if not os.path.isdir(args.input):
+        print(f"Folder input tidak ditemukan: {args.input}", file=sys.stderr)
+        return 2
+
+    jobs = build_jobs(args, params)
+    pending = [job for job in jobs if args.force or not is_up_to_date(job)]
+    skipped = len(jobs) - len(pending)
+    print(f"{len(jobs)} job ditemukan, {skipped} dilewati (output sudah terbaru), {len(pending)} diproses.", file=sys.stderr)
+
+    failed = 0
+    start = time.time()
+
+    def report(done: int, result: dict):
+        job = result["job"]
+        status = "ok" if result["ok"] else "GAGAL"
+        source = job.inputs[0] if len(job.inputs) == 1 else f"{len(job.inputs)} file"
+        line = f"[{done}/{len(pending)}] {status:5} {source} -> {job.output} ({result['seconds']:.1f}s)"
+        if not result["ok"]:
+            line += f": {result['error']}"
+        print(line, file=sys.stderr)
+
+    if args.workers <= 1 or len(pending) <= 1:
+        results = map(run_job, pending)
+        for done, result in enumerate(results, 1):
+            failed += not result["ok"]
+            report(done, result)
+    else:
+        with Pool(args.workers) as pool:
+            for done, result in enumerate(pool.imap_unordered(run_job, pending), 1):
+                failed += not result["ok"]
+                report(done, result)
+
+    print(
+        f"Selesai dalam {time.time() - start:.1f}s: {len(pending) - failed} berhasil, "
+        f"{skipped} dilewati, {failed} gagal.",
+        file=sys.stderr
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,623 @@
+"""
+Operasi PDF inti, tanpa ketergantungan ke FastAPI.
+
+Dipakai oleh API (convert_pdf.py), endpoint /batch, dan CLI (pdf_cli.py).
+Sumber PDF boleh berupa path, stream biner, atau PdfReader yang sudah di-parse.
+Operasi halaman mengembalikan PdfWriter (tulis dengan write_pdf); konversi
+lain langsung menulis ke path tujuan.
+"""
+import os
+import shutil
+import tempfile
+import zipfile
+from io import BytesIO
+from typing import IO, Callable, Iterable, List, Optional, Set, Tuple, Union
+
+from pypdf import PdfWriter, PdfReader, PasswordType
+from pdf2docx import Converter
+from pdf2image import convert_from_path
+from PIL import Image, ImageEnhance
+
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+
+import camelot
+import pandas as pd
+import fitz  # PyMuPDF
+from openpyxl.utils.cell import get_column_letter
+from openpyxl.drawing.image import Image as OpenPyXLImage
+from docx import Document
+from docx.enum.text import WD_BREAK
+from docx.shared import Pt
+from pptx import Presentation
+from pptx.util import Inches
+
+PdfSource = Union[str, IO[bytes], PdfReader]
+# progress(tahap, selesai, total): dipanggil dari dalam loop per halaman/tabel
+ProgressCallback = Callable[[str, int, int], None]
+
+
+class PdfOperationError(ValueError):
+    """Error karena input pengguna (bukan bug server). API meneruskannya sebagai HTTPException."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# --- Helper ---
+
+PROGRESS_STEPS = 50
+
+def _no_progress(stage: str, done: int, total: int):
+    pass
+
+def _page_chunks(src_path: str, progress: Optional[ProgressCallback]) -> List[Tuple[int, int]]:
+    """
+    Rentang halaman (1-based, inklusif) untuk library yang memproses banyak halaman
+    per panggilan (poppler, camelot). Tanpa progress cukup satu panggilan; dengan
+    progress dipecah menjadi paling banyak PROGRESS_STEPS panggilan.
+    """
+    with fitz.open(src_path) as doc:
+        total = doc.page_count
+    if total == 0:
+        raise PdfOperationError("PDF tidak memiliki halaman.")
+    size = total if progress is None else max(1, -(-total // PROGRESS_STEPS))
+    return [(first, min(first + size - 1, total)) for first in range(1, total + 1, size)]
+
+def open_reader(source: PdfSource, allow_encrypted: bool = False) -> PdfReader:
+    if isinstance(source, PdfReader):
+        reader = source
+    else:
+        try:
+            reader = PdfReader(source)
+        except Exception as e:
+            raise PdfOperationError(f"Error membaca PDF: {e}")
+    if reader.is_encrypted and not allow_encrypted:
+        raise PdfOperationError("File PDF terenkripsi. Buka sandi terlebih dahulu.")
+    return reader
+
+def write_pdf(writer: PdfWriter, dst: Union[str, IO[bytes]]):
+    """Tulis PdfWriter ke path atau stream."""
+    if isinstance(dst, str):
+        with open(dst, "wb") as f:
+            writer.write(f)
+    else:
+        writer.write(dst)
+
+def create_watermark_pdf(text: str) -> BytesIO:
+    packet = BytesIO()
+    can = canvas.Canvas(packet, pagesize=A4)
+    width, height = A4
+    can.setFont("Helvetica", 50)
+    can.setFillAlpha(0.3)
+    can.translate(width / 2, height / 2)
+    can.rotate(45)
+    can.drawCentredString(0, 0, text)
+    can.save()
+    packet.seek(0)
+    return packet
+
+def parse_page_range(range_str: str, max_pages: int) -> Set[int]:
+    """Helper untuk mem-parsing string rentang halaman (cth: '1, 3, 5-7')"""
+    pages = set()
+    try:
+        for part in range_str.split(','):
+            part = part.strip()
+            if '-' in part:
+                start, end = part.split('-')
+                start = int(start.strip())
+                end = int(end.strip())
+                if start < 1 or end > max_pages or start > end:
+                    raise ValueError(f"Rentang '{part}' tidak valid.")
+                # User (1-indexed) -> internal (0-indexed)
+                for i in range(start, end + 1):
+                    pages.add(i - 1)
+            else:
+                page = int(part.strip())
+                if page < 1 or page > max_pages:
+                    raise ValueError(f"Halaman '{page}' di luar rentang.")
+                pages.add(page - 1) # 0-indexed
+    except Exception as e:
+        raise PdfOperationError(
+            f"Format rentang halaman tidak valid: '{range_str}'. Gunakan format seperti '1, 3, 5-7'. Error: {e}"
+        )
+    if not pages:
+        raise PdfOperationError("Tidak ada halaman yang dipilih.")
+    return pages
+
+
+# --- Operasi Halaman ---
+# Halaman reader tidak pernah diubah langsung (reader bisa dipakai bersama dari cache);
+# perubahan selalu dilakukan pada salinan yang dikembalikan PdfWriter.add_page().
+
+def merge_pdfs(
+    sources: Iterable[PdfSource], names: Optional[List[str]] = None, progress: Optional[ProgressCallback] = None
+) -> PdfWriter:
+    sources = list(sources)
+    progress = progress or _no_progress
+    merger = PdfWriter()
+    for i, source in enumerate(sources):
+        progress("merge", i, len(sources))
+        name = names[i] if names else f"#{i + 1}"
+        reader = open_reader(source, allow_encrypted=True)
+        if reader.is_encrypted:
+            raise PdfOperationError(f"File {name} terenkripsi. Harap buka sandi terlebih dahulu.")
+        try:
+            merger.append(reader)
+        except Exception as e:
+            raise PdfOperationError(f"Error membaca {name}: {e}")
+    progress("merge", len(sources), len(sources))
+    return merger
+
+def watermark_pdf(source: PdfSource, text: str) -> PdfWriter:
+    reader = open_reader(source)
+    watermark_page = PdfReader(create_watermark_pdf(text)).pages[0]
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page).merge_page(watermark_page)
+    return writer
+
+def lock_pdf(source: PdfSource, password: str) -> PdfWriter:
+    reader = open_reader(source, allow_encrypted=True)
+    if reader.is_encrypted:
+        raise PdfOperationError("File sudah terenkripsi.")
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    writer.encrypt(password)
+    return writer
+
+def unlock_pdf(source: PdfSource, password: str) -> PdfWriter:
+    """decrypt() mengubah state reader, jadi jangan kirim reader yang dipakai bersama."""
+    reader = open_reader(source, allow_encrypted=True)
+    if not reader.is_encrypted:
+        raise PdfOperationError("File tidak terenkripsi.")
+    if reader.decrypt(password) == PasswordType.NOT_DECRYPTED:
+        raise PdfOperationError("Sandi salah.", status_code=403)
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    return writer
+
+def rotate_pdf(source: PdfSource, angle: int) -> PdfWriter:
+    if angle not in [90, 180, 270]:
+        raise PdfOperationError("Sudut rotasi harus 90, 180, or 270.")
+    writer = PdfWriter()
+    for page in open_reader(source).pages:
+        writer.add_page(page).rotate(angle)
+    return writer
+
+def split_pdf(source: PdfSource, page_range: str) -> Tuple[PdfWriter, PdfWriter]:
+    """Pisahkan halaman pada page_range dari sisanya: (writer_ekstrak, writer_sisa)."""
+    reader = open_reader(source)
+    total_pages = len(reader.pages)
+    extracted_indices = parse_page_range(page_range, total_pages)
+
+    writer_extracted = PdfWriter()
+    writer_remaining = PdfWriter()
+    for i in range(total_pages):
+        if i in extracted_indices:
+            writer_extracted.add_page(reader.pages[i])
+        else:
+            writer_remaining.add_page(reader.pages[i])
+    return writer_extracted, writer_remaining
+
+def assemble_pages(
+    sources: List[PdfSource],
+    order: Iterable[Tuple[int, int, int]],
+    names: Optional[List[str]] = None
+) -> PdfWriter:
+    """
+    Susun halaman dari beberapa PDF dalam satu writer. order berisi
+    (indeks sumber, indeks halaman 0-based, rotasi); halaman boleh dipakai berulang.
+    Objek bersama (font, gambar, content stream) dari satu sumber hanya disalin
+    sekali, karena semua halaman ditambahkan ke writer yang sama.
+    """
+    readers = []
+    for i, source in enumerate(sources):
+        name = names[i] if names else f"#{i + 1}"
+        reader = open_reader(source, allow_encrypted=True)
+        if reader.is_encrypted:
+            raise PdfOperationError(f"File {name} terenkripsi. Harap buka sandi terlebih dahulu.")
+        readers.append(reader)
+
+    writer = PdfWriter()
+    for file_index, page_index, rotation in order:
+        if not 0 <= file_index < len(readers):
+            raise PdfOperationError(f"Indeks file {file_index} di luar rentang (0-{len(readers) - 1}).")
+        reader = readers[file_index]
+        if not 0 <= page_index < len(reader.pages):
+            name = names[file_index] if names else f"#{file_index + 1}"
+            raise PdfOperationError(f"Halaman {page_index + 1} tidak ada di {name} ({len(reader.pages)} halaman).")
+        if rotation % 90 != 0:
+            raise PdfOperationError("Rotasi harus kelipatan 90.")
+        page = writer.add_page(reader.pages[page_index])
+        if rotation:
+            page.rotate(rotation)
+    if len(writer.pages) == 0:
+        raise PdfOperationError("Urutan halaman kosong.")
+    return writer
+
+
+# --- Optimasi PDF ---
+# pypdf menulis PDF apa adanya: tanpa object stream, tanpa kompresi ulang, dan objek
+# yang identik tetap disimpan berkali-kali. Optimasi dilakukan dengan menyimpan ulang
+# lewat fitz (garbage=4: buang objek tak terpakai dan gabungkan objek/stream duplikat).
+# 'images' tiap level adalah (dpi_threshold, dpi_target, kualitas JPEG) untuk downsample
+# gambar; None berarti hanya optimasi lossless.
+OPTIMIZE_LEVELS = {
+    "none": None,
+    "low": {"images": None},
+    "medium": {"images": (200, 150, 80)},
+    "high": {"images": (120, 96, 60)},
+}
+
+def optimize_pdf(src_path: str, dst_path: str, level: str):
+    """Simpan ulang PDF dengan object stream, kompresi ulang stream, dan deduplikasi objek."""
+    if level not in OPTIMIZE_LEVELS:
+        raise PdfOperationError(f"Level optimasi harus salah satu dari: {', '.join(OPTIMIZE_LEVELS)}.")
+    settings = OPTIMIZE_LEVELS[level]
+    doc = fitz.open(src_path)
+    try:
+        if doc.needs_pass:
+            raise PdfOperationError("File PDF terenkripsi. Buka sandi terlebih dahulu.")
+        if settings and settings["images"]:
+            dpi_threshold, dpi_target, quality = settings["images"]
+            doc.rewrite_images(dpi_threshold=dpi_threshold, dpi_target=dpi_target, quality=quality)
+        doc.save(
+            dst_path,
+            garbage=4,
+            deflate=True,
+            deflate_images=True,
+            deflate_fonts=True,
+            use_objstms=1
+        )
+    finally:
+        doc.close()
+
+def compress_pdf(src_path: str, dst_path: str, level: str = "medium"):
+    """Seperti optimize_pdf, tapi file asli yang disalin jika optimasi tidak menghemat ukuran."""
+    optimize_pdf(src_path, dst_path, level)
+    if os.path.getsize(dst_path) >= os.path.getsize(src_path):
+        shutil.copyfile(src_path, dst_path)
+
+
+# --- Konversi ---
+
+def pdf_to_images(src_path: str, out_dir: str, progress: Optional[ProgressCallback] = None) -> List[str]:
+    """Render setiap halaman ke out_dir/page_N.png (membutuhkan Poppler)."""
+    chunks = _page_chunks(src_path, progress)
+    progress = progress or _no_progress
+    total = chunks[-1][1]
+    output_paths = []
+    with tempfile.TemporaryDirectory(dir=out_dir) as temp_dir:
+        for first, last in chunks:
+            paths = convert_from_path(
+                src_path, output_folder=temp_dir, fmt='png', paths_only=True,
+                first_page=first, last_page=last
+            )
+            for path in sorted(paths):
+                output_path = os.path.join(out_dir, f"page_{len(output_paths) + 1}.png")
+                os.replace(path, output_path)
+                output_paths.append(output_path)
+            progress("render", last, total)
+    return output_paths
+
+def pdf_to_powerpoint(src_path: str, dst_path: str, progress: Optional[ProgressCallback] = None):
+    """
+    Setiap halaman PDF menjadi GAMBAR di satu slide (teks tidak dapat diedit).
+    Membutuhkan Poppler.
+    """
+    chunks = _page_chunks(src_path, progress)
+    progress = progress or _no_progress
+    total = chunks[-1][1]
+
+    prs = Presentation()
+    # Dapatkan ukuran slide default (landscape 10x7.5 inch)
+    slide_width = prs.slide_width
+    slide_height = prs.slide_height
+
+    for first, last in chunks:
+        for img in convert_from_path(src_path, first_page=first, last_page=last):
+            # Layout 6 adalah layout kosong (blank)
+            blank_slide_layout = prs.slide_layouts[6]
+            slide = prs.slides.add_slide(blank_slide_layout)
+
+            # Simpan gambar dari Pillow ke buffer memori
+            img_io = BytesIO()
+            img.save(img_io, format='PNG')
+            img_io.seek(0)
+
+            # Tambahkan gambar, paskan ke tinggi slide
+            pic = slide.shapes.add_picture(img_io, Inches(0), Inches(0), height=slide_height)
+
+            # Atur posisi gambar agar di tengah (horizontal)
+            pic.left = int((slide_width - pic.width) / 2)
+            pic.top = 0
+        progress("render", last, total)
+
+    progress("save", 0, 1)
+    prs.save(dst_path)
+    progress("save", 1, 1)
+
+# --- PDF ke Word ---
+# 'layout': pdf2docx (tabel, shape, gambar melayang). 'fast': hanya teks, satu
+# pass dengan fitz + python-docx. 'auto': 'fast' jika semua halaman tanpa
+# gambar dan tanpa tabel bergaris, selain itu 'layout'.
+WORD_MODES = ("layout", "fast", "auto")
+RULED_LINES_MIN = 4  # garis lurus/kotak sebanyak ini dianggap tabel
+
+def page_is_text_only(page) -> bool:
+    if page.get_images(full=False):
+        return False
+    rules = 0
+    for path in page.get_drawings():
+        for item in path["items"]:
+            if item[0] in ("l", "re"):
+                rules += 1
+                if rules >= RULED_LINES_MIN:
+                    return False
+    return True
+
+def _write_text_docx(doc, dst_path: str, progress: ProgressCallback):
+    """Satu blok teks fitz menjadi satu paragraf Word; tebal/miring/ukuran font ikut."""
+    document = Document()
+    for page_index, page in enumerate(doc):
+        progress("text", page_index, doc.page_count)
+        if page_index > 0:
+            document.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
+        for block in page.get_text("dict", sort=True)["blocks"]:
+            if block["type"] != 0:
+                continue
+            paragraph = document.add_paragraph()
+            for line_index, line in enumerate(block["lines"]):
+                spans = [span for span in line["spans"] if span["text"]]
+                if not spans:
+                    continue
+                if line_index > 0 and paragraph.runs:
+                    last = paragraph.runs[-1]
+                    if last.text.endswith("-"):
+                        last.text = last.text[:-1]
+                    elif not last.text.endswith(" "):
+                        last.text += " "
+                for span in spans:
+                    run = paragraph.add_run(span["text"])
+                    run.bold = bool(span["flags"] & 16)
+                    run.italic = bool(span["flags"] & 2)
+                    run.font.size = Pt(round(span["size"] * 2) / 2)
+    progress("text", doc.page_count, doc.page_count)
+    document.save(dst_path)
+
+class _AnalyzeCounter:
+    """
+    fitz.Document untuk tahap analisis pdf2docx (Pages.parse), yang mengambil
+    halaman satu per satu lewat doc[index]; setiap pengambilan dilaporkan.
+    """
+
+    def __init__(self, doc, total: int, progress: ProgressCallback):
+        self._doc = doc
+        self._total = total
+        self._done = 0
+        self._progress = progress
+
+    def __getitem__(self, index):
+        if self._done:
+            self._progress("analyze", self._done, self._total)
+        self._done += 1
+        return self._doc[index]
+
+    def __iter__(self):
+        return iter(self._doc)
+
+    def __len__(self):
+        return len(self._doc)
+
+    def __getattr__(self, name):
+        return getattr(self._doc, name)
+
+def _track_pages(pages, method: str, stage: str, progress: ProgressCallback):
+    """Bungkus method per halaman pdf2docx supaya setiap halaman yang selesai dilaporkan."""
+    done = [0]
+    for page in pages:
+        original = getattr(page, method)
+        def tracked(*args, _original=original, **kwargs):
+            result = _original(*args, **kwargs)
+            done[0] += 1
+            progress(stage, done[0], len(pages))
+            return result
+        setattr(page, method, tracked)
+
+def pdf_to_word(src_path: str, dst_path: str, mode: str = "layout", progress: Optional[ProgressCallback] = None) -> str:
+    """Mengembalikan mode yang benar-benar dipakai ('layout' atau 'fast')."""
+    if mode not in WORD_MODES:
+        raise PdfOperationError("Mode harus 'layout', 'fast', atau 'auto'.")
+    progress = progress or _no_progress
+
+    if mode != "layout":
+        doc = fitz.open(src_path)
+        try:
+            if mode == "fast" or all(page_is_text_only(page) for page in doc):
+                _write_text_docx(doc, dst_path, progress)
+                return "fast"
+        finally:
+            doc.close()
+
+    # Sama dengan Converter.convert(), tapi per tahap supaya progres per halaman terlihat
+    cv = Converter(src_path)
+    try:
+        settings = cv.default_settings
+        cv.load_pages(0, None)
+        pages = [page for page in cv.pages if not page.skip_parsing]
+        progress("analyze", 0, len(pages))
+        cv.pages.parse(_AnalyzeCounter(cv.fitz_doc, len(pages), progress), **settings)
+        progress("analyze", len(pages), len(pages))
+        _track_pages(pages, "parse", "parse", progress)
+        _track_pages(pages, "make_docx", "build", progress)
+        cv.parse_pages(**settings)
+        cv.make_docx(dst_path, **settings)
+    finally:
+        cv.close()
+    return "layout"
+
+def pdf_to_excel(src_path: str, dst_path: str, flavor: str = "lattice", progress: Optional[ProgressCallback] = None):
+    """
+    Mengekstrak tabel dari PDF ke file Excel, termasuk gambar di dalam sel kosong.
+    MEMBUTUHKAN GHOSTSCRIPT terinstal.
+    """
+    if flavor not in ['lattice', 'stream']:
+        raise PdfOperationError("Flavor harus 'lattice' atau 'stream'.")
+
+    chunks = _page_chunks(src_path, progress)
+    progress = progress or _no_progress
+    total_pages = chunks[-1][1]
+
+    print("\n--- [DEBUG] Memulai Ekstraksi Camelot ---")
+    found = []
+    for first, last in chunks:
+        found.extend(camelot.read_pdf(src_path, pages=f"{first}-{last}", flavor=flavor))
+        progress("tables", last, total_pages)
+    tables = camelot.core.TableList(found)
+    print(f"--- [DEBUG] Camelot Selesai. Ditemukan {tables.n} tabel. ---")
+
+    if tables.n == 0:
+        raise PdfOperationError("Tidak ada tabel yang ditemukan di PDF ini.", status_code=404)
+
+    pdf_doc = fitz.open(src_path)
+    print("--- [DEBUG] PyMuPDF (fitz) berhasil membuka PDF. ---")
+
+    try:
+        with pd.ExcelWriter(dst_path, engine='openpyxl') as writer:
+            for i, table in enumerate(tables):
+                progress("excel", i, tables.n)
+                sheet_name = f'Tabel {i+1}'
+                table.df.to_excel(
+                    writer,
+                    sheet_name=sheet_name,
+                    header=False,
+                    index=False
+                )
+
+                ws = writer.sheets[sheet_name]
+                page_num = table.page - 1
+                page = pdf_doc.load_page(page_num)
+
+                page_height = page.rect.height
+
+                print(f"\n--- [DEBUG] Memproses Tabel {i+1} di Halaman PDF {page_num+1} (Tinggi: {page_height}pt) ---")
+
+                images_on_page = page.get_images(full=True)
+                print(f"--- [DEBUG] Ditemukan {len(images_on_page)} gambar di halaman ini. ---")
+
+                # Set untuk melacak xref gambar yang sudah digunakan
+                used_image_xrefs = set()
+
+                for r_idx in range(len(table.rows)):
+                    for c_idx in range(len(table.cols)):
+                        cell_text = table.df.iloc[r_idx, c_idx]
+                        if not cell_text: # Hanya proses sel yang kosong
+                            cell_coords = table.cells[r_idx][c_idx]
+
+                            new_y1 = page_height - cell_coords.y2
+                            new_y2 = page_height - cell_coords.y1
+
+                            cell_bbox = fitz.Rect(cell_coords.x1, new_y1, cell_coords.x2, new_y2)
+
+                            print(f"\n[DEBUG] Memeriksa Sel Kosong [{r_idx},{c_idx}]")
+                            print(f"  > Koord. Asli (Camelot, Bawah): ({cell_coords.x1}, {cell_coords.y1}, {cell_coords.x2}, {cell_coords.y2})")
+                            print(f"  > Koord. Baru (PyMuPDF, Atas): {cell_bbox}")
+
+                            # Flag untuk menandai apakah gambar sudah ditemukan untuk sel ini
+                            image_found_for_cell = False
+
+                            for img_info in images_on_page:
+                                xref = img_info[0]
+
+                                # Lewati gambar jika sudah digunakan
+                                if xref in used_image_xrefs:
+                                    print(f"  > Gambar (xref:{xref}) sudah digunakan. Lewati.")
+                                    continue
+
+                                rects = page.get_image_rects(xref)
+                                for r in rects:
+                                    img_bbox = fitz.Rect(r)
+                                    print(f"  > Membandingkan dengan Gbr (xref:{xref}) di Koordinat: {img_bbox}")
+
+                                    if cell_bbox.intersects(img_bbox):
+                                        print(f"  [BERHASIL!] Gambar BERSINGGUNGAN dengan sel. Mencoba menyisipkan...")
+
+                                        base_image = pdf_doc.extract_image(xref)
+                                        image_bytes = base_image["image"]
+
+                                        try:
+                                            img_data = BytesIO(image_bytes)
+                                            excel_img = OpenPyXLImage(img_data)
+                                            cell_id = f"{get_column_letter(c_idx + 1)}{r_idx + 1}"
+
+                                            ws.row_dimensions[r_idx + 1].height = 70
+                                            ws.column_dimensions[get_column_letter(c_idx + 1)].width = 15
+                                            excel_img.height = 80
+                                            excel_img.width = 80
+
+                                            ws.add_image(excel_img, cell_id)
+                                            print(f"  [SUKSES] Gambar disisipkan ke sel {cell_id}")
+
+                                            used_image_xrefs.add(xref) # Tandai gambar ini sudah digunakan
+                                            image_found_for_cell = True
+                                            break # Keluar dari loop 'r in rects'
+                                        except Exception as e:
+                                            print(f"  [ERROR SISPKA] Gagal memuat/menyisipkan gambar: {e}")
+                                    else:
+                                        print(f"  [INFO] Gambar tidak bersinggungan.")
+
+                                if image_found_for_cell: # Jika sudah ketemu gambar untuk sel ini
+                                    break # Keluar dari loop 'img_info in images_on_page'
+        progress("excel", tables.n, tables.n)
+    finally:
+        print("\n--- [DEBUG] Menutup dokumen PDF. ---")
+        pdf_doc.close()
+
+
+# --- Scan ---
+SCAN_EFFECTS = ['scan', 'magic_color', 'original']
+
+def apply_scan_effect(img: Image.Image, effect: str) -> Image.Image:
+    img = img.convert("RGB")
+    if effect == 'scan':
+        # Grayscale and high contrast
+        img = img.convert('L')
+        img = img.point(lambda x: 0 if x < 140 else 255, '1')
+        img = img.convert('RGB') # Convert back to RGB for consistent processing
+    elif effect == 'magic_color':
+        # Enhance contrast and brightness
+        enhancer = ImageEnhance.Contrast(img)
+        img = enhancer.enhance(1.8) # Increase contrast
+        enhancer = ImageEnhance.Brightness(img)
+        img = enhancer.enhance(1.1) # Slightly increase brightness
+    return img
+
+def scan_images(sources: Iterable[Union[str, IO[bytes]]], dst: Union[str, IO[bytes]], effect: str = "scan", output_format: str = "pdf"):
+    """Terapkan efek scanner ke gambar, lalu tulis sebagai satu PDF atau ZIP berisi JPG."""
+    if effect not in SCAN_EFFECTS:
+        raise PdfOperationError("Invalid effect. Choose 'scan', 'magic_color', or 'original'.")
+    if output_format not in ['pdf', 'jpg']:
+        raise PdfOperationError("Invalid output format. Choose 'pdf' or 'jpg'.")
+
+    processed_images = [apply_scan_effect(Image.open(source), effect) for source in sources]
+
+    if output_format == 'pdf':
+        if not processed_images:
+            raise PdfOperationError("Tidak ada gambar untuk diproses.")
+        processed_images[0].save(
+            dst,
+            format="PDF",
+            resolution=100.0,
+            save_all=True,
+            append_images=processed_images[1:]
+        )
+    else:
+        with zipfile.ZipFile(dst, 'w') as zf:
+            for i, img in enumerate(processed_images):
+                # JPEG sudah terkompresi, simpan langsung ke ZIP tanpa buffer tambahan
+                with zf.open(f"scanned_page_{i+1}.jpg", 'w') as img_file:
+                    img.save(img_file, format='JPEG')